@@ -0,0 +1,227 @@
+"""
+Rolling-origin backtest of forecasting configurations.
+
+Every configuration forecasts every series from several origins near the end
+of its history, and is scored against what actually followed. Fit/predict
+wall-clock time and accuracy (MAPE of the horizon total, and daily MASE
+against a weekly naive forecast) are reported per series and summarised per
+configuration, as JSON.
+
+A configuration is an engine name followed by optional key=value settings.
+history=N truncates the training history to its last N days, and any other
+setting is passed to Prophet, e.g.
+
+    python -m benchmarks.backtest --source synthetic --series 50 \\
+        --config prophet --config "prophet yearly_seasonality=False" \\
+        --config "holt_winters history=365" --config croston \\
+        --output backtest.json
+
+--source orders backtests real item histories from the order store instead,
+and needs the database.
+"""
+import argparse
+import ast
+import json
+import logging
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+# modules
+import engines
+import synthetic
+
+
+def parse_config(config: str) -> Tuple[str, Dict]:
+    engine, *settings = config.split()
+    if engine not in engines.ENGINES or engine == "auto":
+        raise ValueError(f"Unknown engine {engine}")
+    options = {}
+    for setting in settings:
+        key, value = setting.split("=", 1)
+        try:
+            options[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            options[key] = value
+    return engine, options
+
+
+def forecast(
+    engine: str, options: Dict, train: np.ndarray, end: pd.Timestamp, horizon: int
+) -> Tuple[np.ndarray, float]:
+    """Forecasts horizon days after train, returning the forecast and seconds taken."""
+    options = dict(options)
+    history = options.pop("history", None)
+    if history:
+        train = train[-history:]
+    started = time.perf_counter()
+    if engine == "prophet":
+        from prophet import Prophet
+
+        df = synthetic.history_frame(train, end.date())
+        model = Prophet(**options)
+        model.fit(df)
+        future = model.make_future_dataframe(periods=horizon, include_history=False)
+        result = model.predict(future)["yhat"].to_numpy()
+    else:
+        result = engines.forecast(engine, train[None, :], horizon)[0]
+    return result, time.perf_counter() - started
+
+
+def backtest_series(
+    config: str,
+    name: str,
+    values: np.ndarray,
+    end: pd.Timestamp,
+    folds: int,
+    step: int,
+    horizon: int,
+) -> Dict:
+    engine, options = parse_config(config)
+    seconds = 0.0
+    total_errors = []
+    mases = []
+    for fold in range(folds, 0, -1):
+        origin = len(values) - horizon - (fold - 1) * step
+        if origin <= engines.SEASON_DAYS:
+            continue
+        train, actual = values[:origin], values[origin : origin + horizon]
+        origin_date = end - pd.Timedelta(days=len(values) - origin)
+        predicted, elapsed = forecast(engine, options, train, origin_date, horizon)
+        seconds += elapsed
+        if actual.sum() > 0:
+            total_errors.append(abs(predicted.sum() - actual.sum()) / actual.sum())
+        # scale by the in-sample error of a weekly naive forecast
+        naive_errors = np.abs(train[engines.SEASON_DAYS :] - train[: -engines.SEASON_DAYS])
+        scale = naive_errors.mean() if len(naive_errors) else 0
+        if scale > 0:
+            mases.append(float(np.abs(predicted - actual).mean() / scale))
+    return {
+        "config": config,
+        "series": name,
+        "seconds": seconds,
+        "mape_total": float(np.mean(total_errors)) if total_errors else None,
+        "mase": float(np.mean(mases)) if mases else None,
+    }
+
+
+def synthetic_series(count: int, days: int, seed: int) -> List[Tuple[str, np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    return [
+        (
+            f"synthetic-{i}",
+            synthetic.daily_demand(
+                rng,
+                days,
+                level=float(rng.lognormal(1.5, 1.2)),
+                intermittency=float(rng.choice([0, 0.3, 0.7, 0.95])),
+            ),
+        )
+        for i in range(count)
+    ]
+
+
+def order_series(item_codes: List[str], count: int) -> List[Tuple[str, np.ndarray]]:
+    import e2_queries
+    import predictions
+
+    order_store = e2_queries.get_raw_order_data()
+    if not item_codes:
+        # the items with the most order lines
+        lines = np.diff(order_store.offsets)
+        busiest = np.argsort(lines)[::-1][:count]
+        item_codes = [order_store.item_codes[i] for i in busiest.tolist()]
+    series = []
+    for item_code in item_codes:
+        history = predictions.get_orders(item_code)
+        series.append((item_code, np.array([x.qty for x in history], dtype=np.float64)))
+    return series
+
+
+def summarise(results: List[Dict]) -> Dict[str, Dict]:
+    summary = {}
+    for config in dict.fromkeys(x["config"] for x in results):
+        rows = [x for x in results if x["config"] == config]
+        mapes = [x["mape_total"] for x in rows if x["mape_total"] is not None]
+        mases = [x["mase"] for x in rows if x["mase"] is not None]
+        summary[config] = {
+            "series": len(rows),
+            "seconds_total": sum(x["seconds"] for x in rows),
+            "seconds_mean": statistics.mean(x["seconds"] for x in rows),
+            "mape_total_median": statistics.median(mapes) if mapes else None,
+            "mase_median": statistics.median(mases) if mases else None,
+            "mase_mean": statistics.mean(mases) if mases else None,
+        }
+    return summary
+
+
+def format_metric(value) -> str:
+    return "n/a" if value is None else f"{value:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--source", choices=["synthetic", "orders"], default="synthetic")
+    parser.add_argument("--series", type=int, default=50, help="how many series to backtest")
+    parser.add_argument("--items", default="", help="comma separated item codes for --source orders")
+    parser.add_argument("--days", type=int, default=3 * 365, help="synthetic history length")
+    parser.add_argument("--config", action="append", help="configuration, repeatable")
+    parser.add_argument("--folds", type=int, default=3, help="forecast origins per series")
+    parser.add_argument("--step", type=int, default=30, help="days between origins")
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--jobs", type=int, default=-1, help="worker processes, -1 for all cores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    configs = args.config or ["prophet", "seasonal_naive", "holt_winters", "croston"]
+    for config in configs:
+        parse_config(config)
+    if args.source == "synthetic":
+        series = synthetic_series(args.series, args.days, args.seed)
+    else:
+        series = order_series([x for x in args.items.split(",") if x], args.series)
+    end = pd.Timestamp.today().normalize()
+
+    started = time.perf_counter()
+    results = Parallel(n_jobs=args.jobs)(
+        delayed(backtest_series)(
+            config, name, values, end, args.folds, args.step, args.horizon
+        )
+        for config in configs
+        for name, values in series
+    )
+    report = {
+        "source": args.source,
+        "series": len(series),
+        "folds": args.folds,
+        "step": args.step,
+        "horizon": args.horizon,
+        "wall_seconds": time.perf_counter() - started,
+        "summary": summarise(results),
+        "results": results,
+    }
+    for config, row in report["summary"].items():
+        print(
+            f"{config:40} {row['seconds_mean'] * 1000:9.1f} ms/series  "
+            f"median MAPE(total) {format_metric(row['mape_total_median'])}  "
+            f"median MASE {format_metric(row['mase_median'])}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report["summary"], indent=2))
+
+
+if __name__ == "__main__":
+    logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
+    main()
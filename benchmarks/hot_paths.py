@@ -0,0 +1,308 @@
+"""
+Micro-benchmarks of the request hot paths on synthetic data.
+
+Order and despatch lines are generated with synthetic.py at each --scale and
+primed into the raw data caches, so no database is needed. Every benchmark
+is timed over --repeats cold runs (its own caches cleared before each) and
+run once more under tracemalloc for its peak memory.
+
+    python -m benchmarks.hot_paths --scale small --scale medium --output hot_paths.json
+    python -m benchmarks.hot_paths --baseline hot_paths.json --threshold 0.2
+
+With --baseline, the run fails (exit status 1) when a benchmark's median time
+or peak memory is more than --threshold above the baseline's.
+"""
+import argparse
+import datetime
+import gc
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# modules
+import configs
+import e2_queries
+import models
+import predictions
+import synthetic
+import wait_days
+from order_store import OrderStore
+from wait_index import WaitIndex
+
+SCALES = {
+    "small": {"years": 1, "items": 200},
+    "medium": {"years": 3, "items": 2000},
+    "large": {"years": 7, "items": 20000},
+}
+# items and customers each filtered benchmark queries
+SAMPLE = 50
+MODES = ["mean", "median", "max", "min", "mode"]
+
+
+class Dataset:
+    """Synthetic order and despatch lines at one scale, primed into the raw data caches."""
+
+    def __init__(self, years: int, items: int, seed: int):
+        rng = np.random.default_rng(seed)
+        self.order_lines = synthetic.order_lines(rng, items, years)
+        costs = synthetic.item_costs(rng, items)
+        self.wait_lines = synthetic.wait_lines(rng, items, years, costs=costs)
+        self.item_costs = dict(zip(synthetic.item_codes(items), costs.tolist()))
+        self.order_store = build_order_store(self.order_lines)
+        # the busiest items and customers, which see the most requests
+        self.items = busiest([x.item_code for x in self.wait_lines], SAMPLE)
+        self.customers = busiest([x.customer_code for x in self.wait_lines], SAMPLE)
+
+    def prime(self):
+        clear_caches()
+        e2_queries.get_order_quantities.prime(self.order_store)
+        e2_queries.get_raw_wait_data.prime(self.wait_lines)
+        e2_queries.get_item_costs.prime(self.item_costs)
+        wait_days.get_wait_index()
+
+
+def busiest(values: List[str], count: int) -> List[str]:
+    unique, counts = np.unique(np.array(values), return_counts=True)
+    return unique[np.argsort(counts)[::-1][:count]].tolist()
+
+
+def build_order_store(lines: List[models.OrderLine]) -> OrderStore:
+    return OrderStore.from_columns(
+        [x.code for x in lines],
+        [x.base_qty for x in lines],
+        [x.date for x in lines],
+        [x.site for x in lines],
+    )
+
+
+def clear_caches():
+    """Clears the derived caches, leaving the primed raw data in place."""
+    predictions.get_orders.clear_cache()
+    for cached in [
+        wait_days.get_filtered_data,
+        wait_days.get_sorted_wait_dates,
+        wait_days.get_lines_only,
+        wait_days.get_scatter_plot_data,
+        wait_days.get_wait_days_with_missing,
+        wait_days.get_smooth_wait_dates,
+    ]:
+        cached.clear_cache()
+
+
+# Each benchmark does its untimed setup and returns the callable to time
+
+
+def bench_order_store_build(data: Dataset) -> Callable:
+    return lambda: build_order_store(data.order_lines)
+
+
+def bench_wait_ingest(data: Dataset) -> Callable:
+    # rows shaped like the wait extract's, for one fetch batch at a time
+    Row = namedtuple(
+        "Row",
+        "ProcessedDate ItemCode CustomerCode QtyEachDespatched SiteName DateRequired "
+        "CustomerDespatchNo SalesTerritoryName ItemCategory ItemCategoryParent ItemType",
+    )
+    rows = [
+        Row(
+            x.date_despatched, x.item_code, x.customer_code, x.qty_eaches_sent, x.site,
+            x.date_required, x.cda, x.sales_territory, x.item_category,
+            x.item_category_parent, x.item_type,
+        )
+        for x in data.wait_lines
+    ]
+    batch = configs.fetch_batch_rows
+
+    def run():
+        for start in range(0, len(rows), batch):
+            e2_queries.wait_lines_from_rows(rows[start : start + batch], data.item_costs)
+
+    return run
+
+
+def bench_wait_index_build(data: Dataset) -> Callable:
+    return lambda: WaitIndex(data.wait_lines)
+
+
+def bench_get_orders(data: Dataset) -> Callable:
+    def run():
+        predictions.get_orders(None)
+        for item_code in data.items:
+            predictions.get_orders(item_code)
+            predictions.get_orders(item_code, site_filter="Prosperity")
+
+    return run
+
+
+def bench_smooth_predictions(data: Dataset) -> Callable:
+    histories = [
+        [(x.date, x.qty) for x in predictions.get_orders(item_code)]
+        for item_code in data.items
+    ]
+
+    def run():
+        for history in histories:
+            predictions.smooth_predictions(history, smoothing_days=14)
+
+    return run
+
+
+def bench_get_filtered_data(data: Dataset) -> Callable:
+    def run():
+        wait_days.get_filtered_data()
+        wait_days.get_filtered_data(site_filter="9")
+        wait_days.get_filtered_data(category="Category 1")
+        for item_code, customer_code in zip(data.items, data.customers):
+            wait_days.get_filtered_data(item_code=item_code)
+            wait_days.get_filtered_data(customer_code=customer_code)
+            wait_days.get_filtered_data(item_code=item_code, site_filter="WA")
+
+    return run
+
+
+def bench_get_wait_days_with_missing(data: Dataset) -> Callable:
+    def run():
+        wait_days.get_wait_days_with_missing()
+        for item_code, customer_code in zip(data.items[:10], data.customers[:10]):
+            wait_days.get_wait_days_with_missing(item_code)
+            wait_days.get_wait_days_with_missing(customer_code=customer_code)
+
+    return run
+
+
+def bench_smooth_wait_dates(data: Dataset) -> Callable:
+    series = {mode: wait_days.get_wait_days_with_missing(mode=mode) for mode in MODES}
+
+    def run():
+        for mode, wait_dates in series.items():
+            for smoothing in [7, 30]:
+                wait_days.smooth_wait_dates(wait_dates, smoothing, mode)
+
+    return run
+
+
+def bench_wait_date_stats(data: Dataset) -> Callable:
+    year_ago = (datetime.date.today() - datetime.timedelta(days=365)).isoformat()
+    waits = [
+        models.Wait(x.est_value, x.wait_time_days)
+        for x in data.wait_lines
+        if x.date_str > year_ago
+    ]
+
+    def run():
+        for mode in MODES:
+            models.WaitDate(date=year_ago, waits=waits, mode=mode)
+
+    return run
+
+
+BENCHMARKS: Dict[str, Callable[[Dataset], Callable]] = {
+    "order_store_build": bench_order_store_build,
+    "wait_ingest": bench_wait_ingest,
+    "wait_index_build": bench_wait_index_build,
+    "get_orders": bench_get_orders,
+    "smooth_predictions": bench_smooth_predictions,
+    "get_filtered_data": bench_get_filtered_data,
+    "get_wait_days_with_missing": bench_get_wait_days_with_missing,
+    "smooth_wait_dates": bench_smooth_wait_dates,
+    "wait_date_stats": bench_wait_date_stats,
+}
+
+
+def measure(data: Dataset, benchmark: Callable[[Dataset], Callable], repeats: int) -> Dict:
+    data.prime()
+    run = benchmark(data)
+    seconds = []
+    for _ in range(repeats):
+        clear_caches()
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - started)
+
+    clear_caches()
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds_min": min(seconds),
+        "seconds_median": statistics.median(seconds),
+        "peak_bytes": peak,
+    }
+
+
+def regressions(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    found = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in ["seconds_median", "peak_bytes"]:
+            if before[metric] and result[metric] > before[metric] * (1 + threshold):
+                found.append(
+                    f"{key} {metric}: {result[metric]:.4g} vs baseline "
+                    f"{before[metric]:.4g} (+{result[metric] / before[metric] - 1:.0%})"
+                )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--scale", action="append", choices=list(SCALES), help="repeatable, default small and medium")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), help="repeatable, default all")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown or memory growth, 0.2 for 20%%")
+    args = parser.parse_args()
+
+    results = {}
+    for scale in args.scale or ["small", "medium"]:
+        started = time.perf_counter()
+        data = Dataset(**SCALES[scale], seed=args.seed)
+        print(
+            f"{scale}: {len(data.order_lines)} order lines, {len(data.wait_lines)} "
+            f"despatch lines generated in {time.perf_counter() - started:.1f}s"
+        )
+        for name in args.benchmark or list(BENCHMARKS):
+            result = measure(data, BENCHMARKS[name], args.repeats)
+            results[f"{scale}/{name}"] = result
+            print(
+                f"  {name:28} {result['seconds_median'] * 1000:10.1f} ms "
+                f"(min {result['seconds_min'] * 1000:.1f}) "
+                f"peak {result['peak_bytes'] / 2**20:8.1f} MiB"
+            )
+        del data
+        clear_caches()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scales": SCALES, "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        found = regressions(results, baseline, args.threshold)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    main()
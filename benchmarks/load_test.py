@@ -0,0 +1,199 @@
+"""
+Replays a mix of API requests against a running server and reports latency.
+
+Start the server on a SQLite fixture rather than the production database,
+
+    python synthetic.py --items 2000 --years 3 --output fixtures.sqlite
+    DATA_SOURCE=sqlite SQLITE_PATH=fixtures.sqlite python pred_app.py
+
+then, from the project root,
+
+    python -m benchmarks.load_test --fixture fixtures.sqlite --concurrency 16 \\
+        --requests 2000 --output load_test.json
+
+Item codes, customers and categories are drawn from the fixture with a long
+tailed popularity, so popular series are requested often as in production.
+--mix sets the weight of a request kind, e.g. --mix forecast=0 to leave out
+Prophet fits. Throughput and p50/p95/p99 latency are reported overall and
+per request kind.
+"""
+import argparse
+import json
+import sqlite3
+import statistics
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# request kinds, their default weights and URL templates
+REQUEST_MIX = {
+    "forecast": (2, "/{item}"),
+    "forecast_total": (2, "/{item}?total_only=true&days=90"),
+    "past_orders": (2, "/{item}?past_orders_only=true&smoothing=14"),
+    "wait": (3, "/wait/{item}"),
+    "wait_filtered": (3, "/wait/-NONE-?customer_code={customer}&smoothing=7&mode={mode}"),
+    "wait_site": (1, "/wait/-NONE-?site_filter={site}&category={category}"),
+    "wait_scatter": (1, "/wait/-NONE-?scatter_plot_group=customer_code&category={category}"),
+    "wait_lines": (1, "/wait/{item}?lines_only=true&limit=100"),
+}
+MODES = ["mean", "median", "max", "min", "mode"]
+PERCENTILES = [50, 95, 99]
+
+
+def fixture_values(path: str) -> Dict[str, List[str]]:
+    """Distinct request values in the fixture, most frequent first."""
+    cnxn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return {
+            name: [
+                row[0]
+                for row in cnxn.execute(
+                    f"SELECT {column} FROM wait_lines WHERE {column} IS NOT NULL "
+                    f"GROUP BY {column} ORDER BY COUNT(*) DESC"
+                )
+            ]
+            for name, column in [
+                ("item", "ItemCode"),
+                ("customer", "CustomerCode"),
+                ("site", "SiteName"),
+                ("category", "ItemCategory"),
+            ]
+        }
+    finally:
+        cnxn.close()
+
+
+def plan_requests(
+    values: Dict[str, List[str]], weights: Dict[str, float], count: int, seed: int
+) -> List[Tuple[str, str]]:
+    """count (kind, path) pairs, values picked with Zipf-like popularity."""
+    rng = np.random.default_rng(seed)
+    kinds = [kind for kind in REQUEST_MIX if weights[kind] > 0]
+    p = np.array([weights[kind] for kind in kinds], dtype=float)
+    popularity = {
+        name: 1 / np.arange(1, len(options) + 1) ** 1.1 for name, options in values.items()
+    }
+
+    def pick(name):
+        weights = popularity[name]
+        return values[name][rng.choice(len(weights), p=weights / weights.sum())]
+
+    planned = []
+    for kind in rng.choice(kinds, count, p=p / p.sum()).tolist():
+        template = REQUEST_MIX[kind][1]
+        fields = {name: urllib.parse.quote(pick(name)) for name in values if "{" + name + "}" in template}
+        planned.append((kind, template.format(mode=rng.choice(MODES), **fields)))
+    return planned
+
+
+def timed_request(url: str, timeout: float) -> Tuple[int, float]:
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def latency_summary(seconds: List[float]) -> Dict:
+    if not seconds:
+        return {"requests": 0}
+    percentiles = np.percentile(seconds, PERCENTILES)
+    return {
+        "requests": len(seconds),
+        "mean_ms": statistics.mean(seconds) * 1000,
+        **{f"p{p}_ms": float(value) * 1000 for p, value in zip(PERCENTILES, percentiles)},
+        "max_ms": max(seconds) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--url", default="http://localhost:8099")
+    parser.add_argument("--fixture", help="SQLite fixture the server is running on")
+    parser.add_argument("--items", default="", help="comma separated item codes, without a fixture")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=0, help="requests sent first and not measured")
+    parser.add_argument("--mix", action="append", default=[], help="kind=weight, repeatable")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    weights = {kind: weight for kind, (weight, _) in REQUEST_MIX.items()}
+    for setting in args.mix:
+        kind, weight = setting.split("=", 1)
+        if kind not in REQUEST_MIX:
+            parser.error(f"unknown request kind {kind}, choose from {', '.join(REQUEST_MIX)}")
+        weights[kind] = float(weight)
+    if args.fixture:
+        values = fixture_values(args.fixture)
+    else:
+        values = {"item": [x for x in args.items.split(",") if x]}
+        # without a fixture only the kinds that need nothing but an item code can run
+        for kind, (_, template) in REQUEST_MIX.items():
+            if any("{" + name + "}" in template for name in ["customer", "site", "category"]):
+                weights[kind] = 0
+    if not values.get("item"):
+        parser.error("give --fixture or --items")
+
+    planned = plan_requests(values, weights, args.warmup + args.requests, args.seed)
+    base_url = args.url.rstrip("/")
+
+    def send(request):
+        kind, path = request
+        return (kind, *timed_request(base_url + path, args.timeout))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(send, planned[: args.warmup]))
+        started = time.perf_counter()
+        results = list(pool.map(send, planned[args.warmup :]))
+        wall_seconds = time.perf_counter() - started
+
+    succeeded = [x for x in results if x[1] == 200]
+    report = {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "wall_seconds": wall_seconds,
+        "throughput_per_second": len(results) / wall_seconds if wall_seconds else None,
+        "errors": len(results) - len(succeeded),
+        "overall": latency_summary([x[2] for x in succeeded]),
+        "kinds": {
+            kind: {
+                **latency_summary([x[2] for x in succeeded if x[0] == kind]),
+                "errors": sum(1 for x in results if x[0] == kind and x[1] != 200),
+            }
+            for kind in dict.fromkeys(x[0] for x in results)
+        },
+    }
+    print(
+        f"{len(results)} requests in {wall_seconds:.1f}s, "
+        f"{report['throughput_per_second']:.1f}/s, {report['errors']} errors"
+    )
+    for kind, row in [("overall", report["overall"])] + list(report["kinds"].items()):
+        if row["requests"]:
+            print(
+                f"  {kind:16} {row['requests']:6} ok  p50 {row['p50_ms']:8.1f} ms  "
+                f"p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms"
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Memory held by the despatch and order line records.
+
+Despatch lines are read from a SQLite fixture, so their strings and dates
+arrive as separate objects per row as they do from the production database,
+and are built twice: into dict-backed dataclasses holding every value as
+fetched, which is how the lines were kept before the records were slotted,
+and through e2_queries.wait_lines_from_rows. Synthetic order lines are built
+as both kinds of dataclass too. The bytes each set of records keeps alive
+are measured with tracemalloc.
+
+    DATA_SOURCE=sqlite python -m benchmarks.record_memory --fixture fixtures.sqlite
+
+Without --fixture, one is written to a temporary file from --items and --years.
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# modules
+import data_source
+import e2_queries
+import models
+import synthetic
+
+# the records as they were before, with a __dict__ per instance
+DictWaitLine = dataclasses.make_dataclass(
+    "DictWaitLine", [field.name for field in dataclasses.fields(models.WaitDatabaseLine)]
+)
+DictOrderLine = dataclasses.make_dataclass(
+    "DictOrderLine", [field.name for field in dataclasses.fields(models.OrderLine)]
+)
+
+
+def dict_wait_lines(rows: list, item_costs: Dict) -> List[DictWaitLine]:
+    """Despatch lines built per row, holding each fetched value as is."""
+    return [
+        DictWaitLine(
+            site=(
+                "90 Prosperity"
+                if row.SiteName.startswith("11") or row.SiteName.startswith("17")
+                else row.SiteName
+            ),
+            item_code=row.ItemCode,
+            customer_code=row.CustomerCode,
+            wait_time_days=max(0, (row.ProcessedDate - row.DateRequired).days),
+            qty_eaches_sent=max(0, row.QtyEachDespatched),
+            date_required=row.DateRequired,
+            date_despatched=row.ProcessedDate,
+            cda=row.CustomerDespatchNo,
+            sales_territory=row.SalesTerritoryName,
+            item_category=row.ItemCategory,
+            item_type=row.ItemType,
+            item_category_parent=row.ItemCategoryParent,
+            est_value=row.QtyEachDespatched * float(item_costs.get(row.ItemCode, 0)),
+            date_str=row.ProcessedDate.isoformat(),
+            required_str=row.DateRequired.isoformat(),
+            day=row.ProcessedDate.day,
+            month=row.ProcessedDate.month,
+            year=row.ProcessedDate.year,
+        )
+        for row in rows
+    ]
+
+
+def fixture_item_costs(source: data_source.SqliteSource) -> Dict:
+    """Cost of one each per item code, preferring the average price as get_item_costs does."""
+    with source.item_costs() as cursor:
+        rows = cursor.fetchall()
+    return {
+        row.Code: row.AvgPriceAUDEach if row.AvgPriceAUDEach else row.ListPriceAUDEach
+        for row in rows
+    }
+
+
+def load_wait_lines(source: data_source.SqliteSource, build: Callable, item_costs: Dict) -> list:
+    lines = []
+    with source.wait_lines() as cursor:
+        for rows in data_source.fetch_batches(cursor):
+            lines.extend(build(rows, item_costs))
+    return lines
+
+
+def retained(build: Callable) -> Dict:
+    """Bytes still allocated once build() has returned, and the seconds it took."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    records = build()
+    seconds = time.perf_counter() - started
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"records": len(records), "bytes": held, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("--fixture", help="SQLite fixture to read the despatch lines from")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    path = args.fixture
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix=".sqlite")
+        os.close(handle)
+        synthetic.write_fixture(path, args.items, args.years, args.seed)
+    try:
+        source = data_source.SqliteSource(path)
+        item_costs = fixture_item_costs(source)
+        results = {
+            "wait_lines/dict": retained(
+                lambda: load_wait_lines(source, dict_wait_lines, item_costs)
+            ),
+            "wait_lines/slotted": retained(
+                lambda: load_wait_lines(source, e2_queries.wait_lines_from_rows, item_costs)
+            ),
+        }
+    finally:
+        if args.fixture is None:
+            os.remove(path)
+
+    orders = synthetic.order_lines(np.random.default_rng(args.seed), args.items, args.years)
+    columns = [
+        [getattr(x, field.name) for x in orders] for field in dataclasses.fields(models.OrderLine)
+    ]
+    del orders
+    results["order_lines/dict"] = retained(lambda: [DictOrderLine(*x) for x in zip(*columns)])
+    results["order_lines/slotted"] = retained(lambda: [models.OrderLine(*x) for x in zip(*columns)])
+
+    for name, result in results.items():
+        print(
+            f"  {name:20} {result['records']:9} records {result['bytes'] / 2**20:8.1f} MiB "
+            f"{result['bytes'] / result['records']:6.0f} B/record  {result['seconds']:.2f}s"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    main()
@@ -0,0 +1,104 @@
+"""
+Compares cold and warm started Prophet refits on synthetic series.
+
+Each series is first fitted on its history minus --refresh-days, as the
+previous fit would have been, then refitted on the full history both from
+scratch and warm started from the previous parameters.
+
+    python -m benchmarks.warm_start --series 20 --output warm_start.json
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+
+import numpy as np
+
+# modules
+import predictions
+import synthetic
+
+
+def forecast(model, periods: int) -> np.ndarray:
+    future = model.make_future_dataframe(periods=periods, include_history=False)
+    return model.predict(future)["yhat"].to_numpy()
+
+
+def benchmark_series(df, refresh_days: int, horizon: int) -> dict:
+    previous = predictions.fit_model(df.iloc[:-refresh_days])
+
+    started = time.perf_counter()
+    cold = predictions.fit_model(df)
+    cold_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    warm = predictions.fit_model(df, previous.params)
+    warm_seconds = time.perf_counter() - started
+
+    cold_forecast = forecast(cold, horizon)
+    warm_forecast = forecast(warm, horizon)
+    scale = max(np.abs(cold_forecast).mean(), 1e-9)
+    return {
+        "cold_seconds": cold_seconds,
+        "warm_seconds": warm_seconds,
+        # mean absolute difference between the forecasts relative to the forecast level
+        "forecast_delta": float(np.abs(warm_forecast - cold_forecast).mean() / scale),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--series", type=int, default=20)
+    parser.add_argument("--days", type=int, default=3 * 365, help="history length")
+    parser.add_argument("--refresh-days", type=int, default=7, help="days gained since the previous fit")
+    parser.add_argument("--horizon", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for i in range(args.series):
+        demand = synthetic.daily_demand(
+            rng,
+            args.days,
+            level=float(rng.lognormal(2, 1)),
+            intermittency=float(rng.choice([0, 0.5, 0.9])),
+        )
+        results.append(
+            benchmark_series(
+                synthetic.history_frame(demand), args.refresh_days, args.horizon
+            )
+        )
+        print(
+            f"series {i}: cold {results[-1]['cold_seconds']:.2f}s "
+            f"warm {results[-1]['warm_seconds']:.2f}s "
+            f"delta {results[-1]['forecast_delta']:.2%}"
+        )
+
+    cold_total = sum(x["cold_seconds"] for x in results)
+    warm_total = sum(x["warm_seconds"] for x in results)
+    report = {
+        "series": args.series,
+        "days": args.days,
+        "refresh_days": args.refresh_days,
+        "cold_seconds_total": cold_total,
+        "warm_seconds_total": warm_total,
+        "speedup": cold_total / warm_total if warm_total else None,
+        "forecast_delta_median": statistics.median(x["forecast_delta"] for x in results),
+        "forecast_delta_max": max(x["forecast_delta"] for x in results),
+        "results": results,
+    }
+    print(
+        f"cold {cold_total:.1f}s, warm {warm_total:.1f}s, speedup {report['speedup']:.2f}x, "
+        f"median forecast delta {report['forecast_delta_median']:.2%}"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
+    main()
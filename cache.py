@@ -1,47 +1,368 @@
+import bisect
 import functools
+import inspect
+import itertools
+import logging
+import sys
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
 
 CACHE_SECONDS = 43200  # 12 hours
+STALE_SECONDS = 43200  # serve expired values for up to 12 more hours while refreshing
+SWEEP_SECONDS = 600  # how often expired entries are purged
+SIZE_SAMPLE = 16  # items sampled per container when estimating a value's size
 
+# shared by every stale-while-revalidate cache for background recomputes
+refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
 
-def time_limited_cache(max_age_seconds):
-    cache = {}
+# compute time histogram buckets in seconds, from fast lookups to full DB extracts
+COMPUTE_BUCKETS = (0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# sweep functions of every decorated function, run by the sweeper thread
+sweepers = []
+sweeper_started = threading.Event()
+
+
+class CacheStats:
+    """Counters for one decorated function, rendered by render_metrics."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_serves = 0
+        self.evictions = 0
+        self.refresh_failures = 0
+        self.lock_wait_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.compute_counts = [0] * (len(COMPUTE_BUCKETS) + 1)
+        # set by the decorator, returns (entry count, estimated bytes)
+        self.size = lambda: (0, 0)
+
+    def count(self, counter: str, amount=1):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def observe_compute(self, seconds: float):
+        with self.lock:
+            self.compute_seconds += seconds
+            bucket = bisect.bisect_left(COMPUTE_BUCKETS, seconds)
+            self.compute_counts[bucket] += 1
+
+
+# stats of every decorated function, by module qualified name
+cache_stats: Dict[str, CacheStats] = {}
+
+
+def render_metrics() -> str:
+    """Renders the stats of every cached function in Prometheus text format."""
+    counters = [
+        ("hits", "Calls answered from a fresh cache entry"),
+        ("misses", "Calls that computed the value while the caller waited"),
+        ("stale_serves", "Calls answered from an expired entry while it refreshed"),
+        ("evictions", "Entries evicted to stay within max_entries or max_bytes"),
+        ("refresh_failures", "Background refreshes that raised"),
+        ("lock_wait_seconds", "Seconds callers spent waiting on a key lock"),
+    ]
+    lines = []
+    stats = sorted(cache_stats.values(), key=lambda x: x.name)
+    for counter, help_text in counters:
+        metric = f"cache_{counter}_total"
+        lines.append(f"# HELP {metric} {help_text}.")
+        lines.append(f"# TYPE {metric} counter")
+        for stat in stats:
+            lines.append(f'{metric}{{function="{stat.name}"}} {getattr(stat, counter)}')
+    lines.append("# HELP cache_compute_seconds Time spent computing values.")
+    lines.append("# TYPE cache_compute_seconds histogram")
+    for stat in stats:
+        with stat.lock:
+            compute_counts = list(stat.compute_counts)
+            compute_seconds = stat.compute_seconds
+        cumulative = 0
+        for bound, bucket_count in zip(
+            [str(x) for x in COMPUTE_BUCKETS] + ["+Inf"], compute_counts
+        ):
+            cumulative += bucket_count
+            lines.append(
+                f'cache_compute_seconds_bucket{{function="{stat.name}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'cache_compute_seconds_sum{{function="{stat.name}"}} {compute_seconds}')
+        lines.append(f'cache_compute_seconds_count{{function="{stat.name}"}} {cumulative}')
+    sizes = [(stat.name, stat.size()) for stat in stats]
+    lines.append("# HELP cache_entries Entries currently cached.")
+    lines.append("# TYPE cache_entries gauge")
+    for name, (entries, _) in sizes:
+        lines.append(f'cache_entries{{function="{name}"}} {entries}')
+    lines.append("# HELP cache_bytes Estimated bytes currently cached, when max_bytes is set.")
+    lines.append("# TYPE cache_bytes gauge")
+    for name, (_, estimated_bytes) in sizes:
+        lines.append(f'cache_bytes{{function="{name}"}} {estimated_bytes}')
+    return "\n".join(lines) + "\n"
+
+
+def approximate_size(value, depth: int = 0) -> int:
+    """Estimates the bytes held by value, sampling large containers."""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        # NumPy arrays
+        return nbytes
+    size = sys.getsizeof(value)
+    if depth >= 4:
+        return size
+    if isinstance(value, dict):
+        sample = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        sampled = sum(
+            approximate_size(k, depth + 1) + approximate_size(v, depth + 1)
+            for k, v in sample
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        sample = list(itertools.islice(value, SIZE_SAMPLE))
+        sampled = sum(approximate_size(item, depth + 1) for item in sample)
+    elif hasattr(value, "__dict__"):
+        return size + approximate_size(vars(value), depth + 1)
+    elif hasattr(value, "__slots__"):
+        return size + sum(
+            approximate_size(getattr(value, name, None), depth + 1)
+            for name in value.__slots__
+        )
+    else:
+        return size
+    if not sample:
+        return size
+    return size + int(sampled * len(value) / len(sample))
+
+
+def shallow_size(value) -> int:
+    """
+    Estimates the bytes of value's own containers but not of the records in
+    them, for values that are views onto records another cache holds.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(shallow_size(item) for item in value.values())
+    return size
+
+
+def sweep_forever():
+    while True:
+        time.sleep(SWEEP_SECONDS)
+        for sweep in list(sweepers):
+            try:
+                sweep()
+            except Exception:
+                logging.exception("Cache sweep failed")
+
+
+def start_sweeper():
+    if sweeper_started.is_set():
+        return
+    sweeper_started.set()
+    threading.Thread(target=sweep_forever, name="cache-sweeper", daemon=True).start()
+
+
+def time_limited_cache(
+    max_age_seconds,
+    stale_seconds=None,
+    max_entries=None,
+    max_bytes=None,
+    on_store=None,
+    sizer=approximate_size,
+):
+    """
+    Caches results per argument tuple for max_age_seconds.
+
+    With stale_seconds set, a value older than max_age_seconds but younger
+    than max_age_seconds + stale_seconds is still returned immediately, and a
+    single background recompute is scheduled to replace it. Only values past
+    that hard limit make the caller wait for a recompute.
+
+    max_entries and max_bytes bound the cache, evicting the least recently
+    used entries first. Sizes are estimated with sizer, approximate_size by
+    default; pass shallow_size for values sharing their records with another
+    cache, which approximate_size would count again in full.
+
+    on_store is called with each newly computed or primed value followed by
+    the arguments it was cached for, once the value is what other callers get.
+    """
+    cache = OrderedDict()
+    sizes = {}
+    # per key being computed, its lock and the number of callers holding or
+    # waiting on it; a key's lock is dropped when the last of them is done
     locks = {}
+    refreshing = set()
+    refreshing_lock = threading.Lock()
+    # guards cache order, sizes, total_bytes and locks
+    state_lock = threading.Lock()
+    total_bytes = 0
+    hard_max_age = max_age_seconds + (stale_seconds or 0)
 
     def decorator(func):
+        stats = CacheStats(f"{func.__module__}.{func.__qualname__}")
+        stats.size = lambda: (len(cache), total_bytes)
+        cache_stats[stats.name] = stats
+
+        def discard(key):
+            nonlocal total_bytes
+            cache.pop(key, None)
+            total_bytes -= sizes.pop(key, 0)
+
+        def claim_lock(key):
+            """The lock of key, kept for it until the matching release_lock."""
+            with state_lock:
+                entry = locks.get(key)
+                if entry is None:
+                    entry = locks[key] = [threading.Lock(), 0]
+                entry[1] += 1
+                return entry[0]
+
+        def release_lock(key):
+            with state_lock:
+                entry = locks[key]
+                entry[1] -= 1
+                if not entry[1]:
+                    del locks[key]
+
+        def store(key, value):
+            nonlocal total_bytes
+            size = sizer(value) if max_bytes else 0
+            with state_lock:
+                total_bytes -= sizes.pop(key, 0)
+                cache[key] = (value, time.time())
+                cache.move_to_end(key)
+                sizes[key] = size
+                total_bytes += size
+                # always keep the newest entry, however large
+                while len(cache) > 1 and (
+                    (max_entries and len(cache) > max_entries)
+                    or (max_bytes and total_bytes > max_bytes)
+                ):
+                    discard(next(iter(cache)))
+                    stats.count("evictions")
+
+        def lookup(key):
+            with state_lock:
+                entry = cache.get(key)
+                if entry is not None:
+                    cache.move_to_end(key)
+                return entry
+
+        def compute(key, args, kwargs):
+            started = time.perf_counter()
+            value = func(*args, **kwargs)
+            stats.observe_compute(time.perf_counter() - started)
+            store(key, value)
+            if on_store:
+                on_store(value, *args, **kwargs)
+            return value
+
+        def refresh(key, args, kwargs):
+            lock = claim_lock(key)
+            try:
+                with lock:
+                    # a blocking caller may have recomputed it in the meantime
+                    entry = lookup(key)
+                    if entry and time.time() - entry[1] < max_age_seconds:
+                        return
+                    compute(key, args, kwargs)
+            except Exception:
+                stats.count("refresh_failures")
+                logging.exception(f"Background refresh of {func.__name__} failed")
+            finally:
+                release_lock(key)
+                with refreshing_lock:
+                    refreshing.discard(key)
+
+        def schedule_refresh(key, args, kwargs):
+            with refreshing_lock:
+                if key in refreshing:
+                    return
+                refreshing.add(key)
+            refresh_pool.submit(refresh, key, args, kwargs)
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             key = (args, tuple(sorted(kwargs.items())))
             # Check if the cached value exists and is not expired
-            if key in cache:
-                value, timestamp = cache[key]
-                if time.time() - timestamp < max_age_seconds:
+            entry = lookup(key)
+            if entry is not None:
+                value, timestamp = entry
+                age = time.time() - timestamp
+                if age < max_age_seconds:
+                    stats.count("hits")
+                    return value
+                # Serve the stale value while one background thread recomputes it
+                if stale_seconds and age < hard_max_age:
+                    stats.count("stale_serves")
+                    schedule_refresh(key, args, kwargs)
                     return value
-            # If a lock does not exist for the key, create one
-            if key not in locks:
-                locks[key] = threading.Lock()
-            lock = locks[key]
+            # Claim the key's lock, created if no other caller is using it
+            lock = claim_lock(key)
             # Use the lock to ensure only one thread recomputes the value
+            waiting_since = time.perf_counter()
             lock.acquire()
+            stats.count("lock_wait_seconds", time.perf_counter() - waiting_since)
             try:
                 # Check the cache again to avoid recomputing if another thread already did it
-                if key in cache:
-                    value, timestamp = cache[key]
+                entry = lookup(key)
+                if entry is not None:
+                    value, timestamp = entry
                     if time.time() - timestamp < max_age_seconds:
+                        stats.count("hits")
                         return value
                 # Compute and cache the new value
-                value = func(*args, **kwargs)
-                cache[key] = (value, time.time())
-                return value
+                stats.count("misses")
+                return compute(key, args, kwargs)
             finally:
                 lock.release()
+                release_lock(key)
+
+        def prime(value, *args, **kwargs):
+            """Caches value as the result of calling with exactly these arguments."""
+            store((args, tuple(sorted(kwargs.items()))), value)
+            if on_store:
+                on_store(value, *args, **kwargs)
 
         def clear_cache():
-            cache.clear()
-            locks.clear()
+            nonlocal total_bytes
+            with state_lock:
+                cache.clear()
+                sizes.clear()
+                total_bytes = 0
+
+        def invalidate(predicate):
+            """Drops the cached values whose call arguments satisfy predicate.
+
+            predicate receives a dict of every argument by name, defaults included.
+            """
+            with state_lock:
+                keys = list(cache)
+            for key in keys:
+                args, kwargs = key
+                arguments = signature.bind(*args, **dict(kwargs))
+                arguments.apply_defaults()
+                if predicate(arguments.arguments):
+                    with state_lock:
+                        discard(key)
+
+        def sweep():
+            """Purges entries past their hard expiry."""
+            now = time.time()
+            with state_lock:
+                for key, (_, timestamp) in list(cache.items()):
+                    if now - timestamp >= hard_max_age:
+                        discard(key)
 
+        signature = inspect.signature(func)
         wrapper.clear_cache = clear_cache
+        wrapper.invalidate = invalidate
+        wrapper.prime = prime
+        wrapper.sweep = sweep
+        sweepers.append(sweep)
+        start_sweeper()
         return wrapper
 
     return decorator
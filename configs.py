@@ -5,8 +5,17 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+# Where raw rows come from, see data_source.py: "e2" for the production
+# database or "sqlite" for a local fixture at SQLITE_PATH
+data_source = os.getenv("DATA_SOURCE", "e2").lower()
+sqlite_path = os.getenv(
+    "SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures.sqlite")
+)
+
+
 def check_env_variables():
-    required_vars = ["E2_DB_USER", "E2_DB_PW"]
+    # the database credentials are only needed when reading from it
+    required_vars = ["E2_DB_USER", "E2_DB_PW"] if data_source == "e2" else []
     missing_vars = [var for var in required_vars if os.getenv(var) is None]
 
     if missing_vars:
@@ -15,6 +24,10 @@ def check_env_variables():
         error_msg += "\n".join(required_vars)
         error_msg += "\n\nYou can use the .env.template file as a starting point."
         raise EnvironmentError(error_msg)
+    if data_source not in ["e2", "sqlite"]:
+        raise EnvironmentError(
+            f"Error: DATA_SOURCE must be e2 or sqlite, not {data_source}"
+        )
 
 
 check_env_variables()
@@ -22,6 +35,32 @@ check_env_variables()
 db_user = os.getenv("E2_DB_USER")
 db_pw = os.getenv("E2_DB_PW")
 
+# Connections to the E2 database are pooled: at most DB_POOL_SIZE open at once,
+# closed after DB_POOL_IDLE_SECONDS unused, and callers wait up to
+# DB_POOL_TIMEOUT seconds for a free one
+db_pool_size = int(os.getenv("DB_POOL_SIZE", "4"))
+db_pool_idle_seconds = float(os.getenv("DB_POOL_IDLE_SECONDS", "300"))
+db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "600"))
+
+# Load the data and build the common series at startup, reported by /ready
+warm_up = os.getenv("WARM_UP", "true").lower() == "true"
+
+# Sum order lines per item, site and day in the database rather than fetching every line
+aggregate_orders = os.getenv("AGGREGATE_ORDERS", "true").lower() == "true"
+
+# Rows fetched from the database per round trip when streaming the large extracts
+fetch_batch_rows = int(os.getenv("FETCH_BATCH_ROWS", "10000"))
+
+# Refresh cached order and despatch history by fetching only the trailing recheck window
+incremental_refresh = os.getenv("INCREMENTAL_REFRESH", "true").lower() == "true"
+order_recheck_days = int(os.getenv("ORDER_RECHECK_DAYS", "14"))
+wait_recheck_days = int(os.getenv("WAIT_RECHECK_DAYS", "3"))
+
+# Fitted forecast models are kept here so a restart does not have to refit them
+model_store_dir = os.getenv(
+    "MODEL_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_store")
+)
+
 if os.name == "posix":
     read_connect_string = (
         "DRIVER={FreeTDS}; "
@@ -42,3 +81,17 @@ if os.name == "nt":
         f"PWD={db_pw}; "
         "TrustServerCertificate=yes;"
     )
+
+# Nightly precompute of every active item's forecast, see precompute.py.
+# PRECOMPUTE_SITE_FILTERS is a ; separated list of site_filter[,site_filter2]
+# combinations fitted as well as the unfiltered series, e.g. "90 Prosperity;WA,Rotterdam"
+precompute_hour = os.getenv("PRECOMPUTE_HOUR")
+precompute_active_days = int(os.getenv("PRECOMPUTE_ACTIVE_DAYS", "365"))
+precompute_site_filters = [
+    tuple(part.strip() or None for part in (combination.split(",") + [""])[:2])
+    for combination in os.getenv("PRECOMPUTE_SITE_FILTERS", "").split(";")
+    if combination.strip()
+]
+
+# Threads forecasting the items of a /batch request
+batch_workers = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 4)))
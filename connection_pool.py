@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+# idle connections are checked with HEALTH_QUERY before reuse once they have
+# been idle this long, as the server or a firewall may have dropped them
+HEALTH_CHECK_SECONDS = 30
+HEALTH_QUERY = "SELECT 1"
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of database connections.
+
+    At most max_size connections are open at once, and callers wait up to
+    timeout seconds for one to be returned when all are in use. Connections
+    idle for longer than idle_seconds are closed. A connection is returned
+    to the pool only when the block using it completes without an
+    exception, otherwise it is closed rather than handed out again.
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        max_size: int,
+        idle_seconds: float,
+        timeout: float,
+    ):
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.timeout = timeout
+        # (connection, time it was returned), most recently returned last
+        self.idle: List[Tuple[object, float]] = []
+        self.in_use = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        cnxn = self.acquire()
+        try:
+            yield cnxn
+        except BaseException:
+            self.discard(cnxn)
+            raise
+        self.release(cnxn)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            expired = self.take_expired()
+            while not self.idle and self.in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    close_quietly(expired)
+                    raise TimeoutError(
+                        f"No database connection free within {self.timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                self.condition.wait(remaining)
+                expired += self.take_expired()
+            self.in_use += 1
+            cnxn, returned_at = self.idle.pop() if self.idle else (None, None)
+        # close, check and open connections outside the lock
+        close_quietly(expired)
+        try:
+            if cnxn is not None and time.time() - returned_at > HEALTH_CHECK_SECONDS:
+                if not healthy(cnxn):
+                    logging.info("Replacing a pooled database connection that failed its health check")
+                    close_quietly([cnxn])
+                    cnxn = None
+            if cnxn is None:
+                cnxn = self.connect()
+        except BaseException:
+            self.discard(None)
+            raise
+        return cnxn
+
+    def release(self, cnxn):
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((cnxn, time.time()))
+            self.condition.notify()
+
+    def discard(self, cnxn):
+        if cnxn is not None:
+            close_quietly([cnxn])
+        with self.condition:
+            self.in_use -= 1
+            self.condition.notify()
+
+    def take_expired(self) -> list:
+        """Removes the connections idle past idle_seconds, for the caller to close outside the lock."""
+        cutoff = time.time() - self.idle_seconds
+        expired = [cnxn for cnxn, returned_at in self.idle if returned_at < cutoff]
+        self.idle = [(cnxn, returned_at) for cnxn, returned_at in self.idle if returned_at >= cutoff]
+        return expired
+
+    def sweep(self):
+        """Closes the connections idle past idle_seconds."""
+        with self.condition:
+            expired = self.take_expired()
+        close_quietly(expired)
+
+    def close_all(self):
+        """Closes the idle connections, e.g. at exit."""
+        with self.condition:
+            idle, self.idle = self.idle, []
+        close_quietly([cnxn for cnxn, _ in idle])
+
+
+def healthy(cnxn) -> bool:
+    try:
+        cursor = cnxn.cursor()
+        try:
+            cursor.execute(HEALTH_QUERY).fetchall()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def close_quietly(connections: list):
+    for cnxn in connections:
+        try:
+            cnxn.close()
+        except Exception:
+            pass
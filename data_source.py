@@ -0,0 +1,356 @@
+"""
+Where the raw order, item cost and despatch rows come from.
+
+e2_queries asks the configured source for each extract and gets back a
+cursor whose rows have the same columns, types and attribute access
+whichever source is in use:
+
+- e2 (default): the production E2 SQL Server database, over pyodbc.
+- sqlite: a local SQLite fixture holding the already extracted rows, built
+  with `python synthetic.py --output fixtures.sqlite`. For load testing and
+  development without the database.
+
+Select one with DATA_SOURCE, and the fixture with SQLITE_PATH.
+"""
+import atexit
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, Optional
+
+# modules
+import configs
+from cache import sweepers
+from connection_pool import ConnectionPool
+
+ORDERS_PLACED_TODAY_QUERY = """
+-- Calculate the total value of orders entered today excluding specified customer
+SELECT
+    SUM({value}) AS TotalValue
+FROM
+    [SalesOrderLine] AS sol
+    INNER JOIN [SalesOrder] AS so ON so.[SalesOrderID] = sol.[SalesOrderID]
+    INNER JOIN [Customer] AS cust ON cust.[CustomerID] = so.[CustomerID]
+	inner join [item] as i on i.ItemID = sol.ItemID
+	inner join [ItemPackaging] as ip on ip.ItemPackagingID = sol.ItemPackagingID
+    INNER JOIN [ManagementPortal].[dbo].[Item] AS itm ON itm.Code = i.ItemCode
+WHERE
+    CONVERT(DATE, sol.[CreatedDate]) = CAST(GETDATE() AS DATE)
+    AND cust.[CustomerCode] <> 'FAI101';
+"""
+
+ORDER_LINES_SELECT = """
+SELECT
+    itm.ItemCode,
+    sol.QtyOrdered,
+    ipkg.ConversionUnits,
+    CONVERT(VARCHAR(10), sol.DateRequired, 120) AS DateRequired,
+    CASE
+        WHEN si.SiteName = '11 Warehouse' THEN '90 Prosperity'
+        WHEN si.SiteName = '17 Warehouse' THEN '90 Prosperity'
+        ELSE si.SiteName
+    END AS SiteName
+FROM
+    SalesOrderLine AS sol
+INNER JOIN
+    SalesOrder AS so ON so.SalesOrderID = sol.SalesOrderID
+INNER JOIN
+    EntityTypeTransactionStatus AS ets ON ets.EntityTypeTransactionStatusID = so.EntityTypeTransactionStatusID
+INNER JOIN
+    Item AS itm ON itm.ItemID = sol.ItemID
+INNER JOIN
+    ItemPackaging AS ipkg ON ipkg.ItemPackagingID = sol.ItemPackagingID
+INNER JOIN
+    Site as si on si.SiteID = so.SiteID
+INNER JOIN
+    Customer as cu on cu.CustomerID = so.CustomerID
+WHERE
+    sol.DateRequired < GETDATE()
+    AND sol.DateRequired > DATEADD(year, -7, GETDATE())
+    AND ets.IsCancelled = 0
+    AND ets.IsOnHold = 0
+    AND sol.QtyOrdered > 0
+    AND cu.CustomerCode != 'FAI101'
+	AND si.SiteName not like '%SAMPLE%'
+    {since_clause}
+"""
+
+ORDER_LINES_QUERY = "SET NOCOUNT ON;" + ORDER_LINES_SELECT + ";"
+
+# The same lines summed per item, site and day on the server. Quantities come
+# back in eaches with a ConversionUnits of 1, so rows keep the shape of ORDER_LINES_QUERY
+ORDER_DAYS_QUERY = (
+    """SET NOCOUNT ON;
+SELECT
+    ItemCode,
+    SUM(QtyOrdered * ConversionUnits) AS QtyOrdered,
+    1 AS ConversionUnits,
+    DateRequired,
+    SiteName
+FROM ("""
+    + ORDER_LINES_SELECT
+    + """) AS lines
+GROUP BY ItemCode, DateRequired, SiteName;"""
+)
+
+ITEM_COSTS_QUERY = """
+SELECT [t0].[Code], [t0].[AvgPriceAUDEach], [t0].[ListPriceAUDEach]
+FROM [ManagementPortal].[dbo].[Item] AS [t0]
+    """
+
+WAIT_LINES_QUERY = """
+-- Select the relevant columns with calculated quantity in each
+SELECT
+cast(cdl.ProcessedDate as date) as ProcessedDate,
+i.ItemCode,
+c.CustomerCode,
+cdl.QtyDespatched * ip.ConversionUnits AS QtyEachDespatched,
+s.SiteName,
+cast(sol.DateRequired as date) as DateRequired,
+cd.CustomerDespatchNo,
+st.SalesTerritoryName
+,cat.EntityClassificationCategoryDisplayName as ItemCategory
+,parent.EntityClassificationCategoryDisplayName as ItemCategoryParent
+,typ.EntityClassificationTypeDisplayName as ItemType
+FROM
+CustomerDespatchLine AS cdl
+INNER JOIN EntityTypeTransactionStatus AS etts ON etts.EntityTypeTransactionStatusID = cdl.EntityTypeTransactionStatusID
+INNER JOIN Item AS i ON i.ItemID = cdl.ItemID
+INNER JOIN ItemPackaging AS ip ON ip.ItemPackagingID = cdl.ItemPackagingID
+INNER JOIN CustomerDespatch AS cd ON cd.CustomerDespatchID = cdl.CustomerDespatchID
+INNER JOIN Customer AS c ON cd.CustomerID = c.CustomerID
+INNER JOIN Site AS s ON s.SiteID = cd.SiteID
+LEFT OUTER JOIN SalesOrderLine AS sol ON sol.SalesOrderLineID = cdl.SalesOrderLineID
+LEFT OUTER JOIN CustomerInvoiceLine as cil on cil.CustomerDespatchLineID = cdl.CustomerDespatchLineID
+LEFT OUTER JOIN SalesTerritory as st on st.SalesTerritoryID = cil.SalesTerritoryID
+INNER JOIN ItemDivision as id on id.ItemID = i.ItemID and id.DivisionID = 1
+INNER JOIN EntityClassificationCategory as cat on id.EntityClassificationCategoryID = cat.EntityClassificationCategoryID
+INNER JOIN EntityClassificationType as typ on typ.EntityClassificationTypeID = id.EntityClassificationTypeID
+INNER JOIN EntityClassificationCategory as parent on parent.EntityClassificationCategoryID = cat.ParentEntityClassificationCategoryID
+WHERE
+etts.IsDespatched = 1
+AND c.CustomerCode != 'FAI101'
+AND cdl.QtyDespatched > 0
+AND s.SiteName not like '%SAMPLE%'
+AND cdl.ProcessedDate IS NOT NULL
+AND cdl.ProcessedDate > DATEADD(year, -7, GETDATE())
+{since_clause}
+ORDER BY
+cdl.ProcessedDate desc
+"""
+
+
+class SqlServerSource:
+    """The production E2 SQL Server database, through a pool of connections."""
+
+    def __init__(self):
+        self.pool = ConnectionPool(
+            self.connect,
+            max_size=configs.db_pool_size,
+            idle_seconds=configs.db_pool_idle_seconds,
+            timeout=configs.db_pool_timeout,
+        )
+        # close idle connections even while no queries are running
+        sweepers.append(self.pool.sweep)
+        atexit.register(self.pool.close_all)
+
+    def connect(self):
+        import pyodbc
+
+        # autocommit so pooled connections do not hold a transaction open between queries
+        return pyodbc.connect(configs.read_connect_string, autocommit=True)
+
+    @contextmanager
+    def execute(self, query: str, *params) -> Iterator:
+        with self.pool.connection() as cnxn:
+            cursor = cnxn.cursor()
+            try:
+                cursor.execute(query, *params)
+                yield cursor
+            finally:
+                cursor.close()
+
+    def orders_placed_today(self, dollars: bool):
+        value = "ip.ConversionUnits * sol.QtyOrdered"
+        if dollars:
+            value = "itm.[AvgPriceAUDEach] * " + value
+        return self.execute(ORDERS_PLACED_TODAY_QUERY.format(value=value))
+
+    def order_lines(self, since: Optional[str] = None):
+        if since is None:
+            return self.execute(ORDER_LINES_QUERY.format(since_clause=""))
+        return self.execute(
+            ORDER_LINES_QUERY.format(since_clause="AND sol.DateRequired >= ?"), since
+        )
+
+    def order_days(self, since: Optional[str] = None):
+        if since is None:
+            return self.execute(ORDER_DAYS_QUERY.format(since_clause=""))
+        return self.execute(
+            ORDER_DAYS_QUERY.format(since_clause="AND sol.DateRequired >= ?"), since
+        )
+
+    def item_costs(self):
+        return self.execute(ITEM_COSTS_QUERY)
+
+    def wait_lines(self, since: Optional[str] = None):
+        if since is None:
+            return self.execute(WAIT_LINES_QUERY.format(since_clause=""))
+        return self.execute(
+            WAIT_LINES_QUERY.format(since_clause="AND cdl.ProcessedDate >= ?"), since
+        )
+
+
+# Tables of a SQLite fixture, holding rows in the shape the E2 extracts return
+# them. order_lines also keeps each line's CreatedDate for orders_placed_today.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_lines (
+    ItemCode TEXT, QtyOrdered INTEGER, ConversionUnits INTEGER,
+    DateRequired TEXT, SiteName TEXT, CreatedDate TEXT
+);
+CREATE TABLE IF NOT EXISTS item_costs (
+    Code TEXT PRIMARY KEY, AvgPriceAUDEach REAL, ListPriceAUDEach REAL
+);
+CREATE TABLE IF NOT EXISTS wait_lines (
+    ProcessedDate TEXT, ItemCode TEXT, CustomerCode TEXT, QtyEachDespatched INTEGER,
+    SiteName TEXT, DateRequired TEXT, CustomerDespatchNo TEXT, SalesTerritoryName TEXT,
+    ItemCategory TEXT, ItemCategoryParent TEXT, ItemType TEXT
+);
+CREATE INDEX IF NOT EXISTS order_lines_date ON order_lines (DateRequired);
+CREATE INDEX IF NOT EXISTS order_lines_created ON order_lines (CreatedDate);
+CREATE INDEX IF NOT EXISTS wait_lines_date ON wait_lines (ProcessedDate);
+"""
+
+SQLITE_ORDER_LINES_QUERY = """
+SELECT ItemCode, QtyOrdered, ConversionUnits, DateRequired, SiteName
+FROM order_lines
+WHERE DateRequired <= date('now', 'localtime')
+    AND DateRequired > date('now', 'localtime', '-7 years')
+    AND DateRequired >= ?
+"""
+
+SQLITE_ORDER_DAYS_QUERY = """
+SELECT ItemCode, SUM(QtyOrdered * ConversionUnits) AS QtyOrdered, 1 AS ConversionUnits,
+    DateRequired, SiteName
+FROM order_lines
+WHERE DateRequired <= date('now', 'localtime')
+    AND DateRequired > date('now', 'localtime', '-7 years')
+    AND DateRequired >= ?
+GROUP BY ItemCode, DateRequired, SiteName
+"""
+
+SQLITE_WAIT_LINES_QUERY = """
+SELECT ProcessedDate, ItemCode, CustomerCode, QtyEachDespatched, SiteName,
+    DateRequired, CustomerDespatchNo, SalesTerritoryName, ItemCategory,
+    ItemCategoryParent, ItemType
+FROM wait_lines
+WHERE ProcessedDate > date('now', 'localtime', '-7 years')
+    AND ProcessedDate >= ?
+ORDER BY ProcessedDate DESC
+"""
+
+
+def to_decimal(value: float) -> Decimal:
+    # pyodbc returns SQL Server money and decimal columns as Decimal
+    return Decimal(str(value))
+
+
+class SqliteSource:
+    """A local SQLite fixture standing in for the E2 database."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.row_types = {}
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    @contextmanager
+    def execute(
+        self, query: str, *params, converters: Dict[str, Callable] = None
+    ) -> Iterator:
+        cnxn = self.connect()
+        try:
+            cnxn.row_factory = self.row_factory(converters or {})
+            yield cnxn.execute(query, params)
+        finally:
+            cnxn.close()
+
+    def row_factory(self, converters: Dict[str, Callable]):
+        """Rows with attribute access like pyodbc's, with converters applied per column name."""
+
+        def make_row(cursor, values):
+            columns = tuple(column[0] for column in cursor.description)
+            row_type = self.row_types.get(columns)
+            if row_type is None:
+                row_type = self.row_types[columns] = namedtuple("Row", columns)
+            row = row_type(*values)
+            if converters:
+                row = row._replace(
+                    **{
+                        column: convert(getattr(row, column))
+                        for column, convert in converters.items()
+                        if getattr(row, column) is not None
+                    }
+                )
+            return row
+
+        return make_row
+
+    def orders_placed_today(self, dollars: bool):
+        value = "ol.QtyOrdered * ol.ConversionUnits"
+        if dollars:
+            value = "ic.AvgPriceAUDEach * " + value
+        return self.execute(
+            f"""
+SELECT SUM({value}) AS TotalValue
+FROM order_lines AS ol
+LEFT OUTER JOIN item_costs AS ic ON ic.Code = ol.ItemCode
+WHERE ol.CreatedDate = date('now', 'localtime')
+"""
+        )
+
+    def order_lines(self, since: Optional[str] = None):
+        return self.execute(SQLITE_ORDER_LINES_QUERY, since or "")
+
+    def order_days(self, since: Optional[str] = None):
+        return self.execute(SQLITE_ORDER_DAYS_QUERY, since or "")
+
+    def item_costs(self):
+        return self.execute(
+            "SELECT Code, AvgPriceAUDEach, ListPriceAUDEach FROM item_costs",
+            converters={"AvgPriceAUDEach": to_decimal, "ListPriceAUDEach": to_decimal},
+        )
+
+    def wait_lines(self, since: Optional[str] = None):
+        return self.execute(
+            SQLITE_WAIT_LINES_QUERY,
+            since or "",
+            converters={"ProcessedDate": date.fromisoformat, "DateRequired": date.fromisoformat},
+        )
+
+
+def fetch_batches(cursor) -> Iterator[list]:
+    """Yields a cursor's rows FETCH_BATCH_ROWS at a time, so a whole extract is never held as rows."""
+    cursor.arraysize = configs.fetch_batch_rows
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        yield rows
+
+
+_source = None
+
+
+def get_source():
+    """The data source selected by DATA_SOURCE, created on first use."""
+    global _source
+    if _source is None:
+        if configs.data_source == "sqlite":
+            _source = SqliteSource(configs.sqlite_path)
+        else:
+            _source = SqlServerSource()
+    return _source
@@ -0,0 +1,78 @@
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+
+def to_day_ordinal(date_str: str) -> int:
+    """Converts an ISO 8601 date string to days since 1970-01-01."""
+    return int(np.datetime64(date_str, "D").astype(np.int64))
+
+
+def from_day_ordinal(day: int) -> str:
+    """Converts days since 1970-01-01 back to an ISO 8601 date string."""
+    return str(np.datetime64(int(day), "D"))
+
+
+def to_day_ordinals(date_strs: Sequence[str]) -> np.ndarray:
+    """Converts ISO 8601 date strings to an array of days since 1970-01-01."""
+    return np.array(date_strs, dtype="datetime64[D]").astype(np.int64)
+
+
+def from_day_ordinals(days: np.ndarray) -> List[str]:
+    """Converts an array of days since 1970-01-01 to ISO 8601 date strings."""
+    return np.asarray(days).astype("datetime64[D]").astype(str).tolist()
+
+
+class DaySeries(NamedTuple):
+    """
+    Values on a run of consecutive days, values[i] being the value on day
+    first_day + i (days since 1970-01-01).
+
+    Every day in the run has a value, so gaps are filled when a series is
+    built and aligning or slicing is array indexing. Dates are kept as day
+    ordinals and only formatted by date_strings(), for the JSON responses.
+    """
+
+    first_day: int
+    values: np.ndarray
+
+    @property
+    def last_day(self) -> int:
+        return self.first_day + len(self.values) - 1
+
+    @classmethod
+    def binned(cls, days: np.ndarray, weights: np.ndarray) -> "DaySeries":
+        """Sums weights per day from the first to the last of days, zero on days without any."""
+        first_day = int(days.min())
+        return cls(first_day, np.bincount(days - first_day, weights=weights))
+
+    @classmethod
+    def placed(cls, days: np.ndarray, values: Sequence, fill=None) -> "DaySeries":
+        """Puts values[i] on days[i], with fill on the days in between; days must be distinct."""
+        first_day = int(days.min())
+        dense = np.full(int(days.max()) - first_day + 1, fill, dtype=object)
+        dense[days - first_day] = values
+        return cls(first_day, dense)
+
+    def days(self) -> np.ndarray:
+        return np.arange(self.first_day, self.first_day + len(self.values))
+
+    def slice(self, start_day: int, end_day: int) -> "DaySeries":
+        """The days from start_day to end_day inclusive that the series covers."""
+        start = max(start_day, self.first_day)
+        end = min(end_day, self.last_day)
+        if end < start:
+            return DaySeries(start, self.values[:0])
+        return DaySeries(start, self.values[start - self.first_day : end - self.first_day + 1])
+
+    def align(self, start_day: int, end_day: int, fill=0) -> "DaySeries":
+        """The series on exactly start_day to end_day, with fill on days it does not cover."""
+        values = np.full(max(end_day - start_day + 1, 0), fill, dtype=self.values.dtype)
+        covered = self.slice(start_day, end_day)
+        offset = covered.first_day - start_day
+        values[offset : offset + len(covered.values)] = covered.values
+        return DaySeries(start_day, values)
+
+    def date_strings(self) -> List[str]:
+        """ISO 8601 date of every day in the series."""
+        return from_day_ordinals(self.days())
@@ -1,137 +1,127 @@
-from datetime import date, datetime
+from collections import Counter
+import dataclasses
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Dict, List, Union
-import pyodbc
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 import logging
+import sys
+
+import numpy as np
 
 # modules
 import configs
+import data_source
 import models
 from cache import time_limited_cache
-from cache import CACHE_SECONDS
+from cache import CACHE_SECONDS, STALE_SECONDS
+from day_series import from_day_ordinal, to_day_ordinal
+from order_store import OrderStore, OrderStoreBuilder
 
 logging.basicConfig(level=logging.INFO)
 
 
 @time_limited_cache(max_age_seconds=120)
 def get_orders_placed_today(dollars: bool) -> Decimal:
-    cnxn = pyodbc.connect(configs.read_connect_string)
-    cursor = cnxn.cursor()
-    query = """
--- Calculate the total value of orders entered today excluding specified customer
-SELECT 
-    SUM(itm.[AvgPriceAUDEach] * ip.ConversionUnits * sol.QtyOrdered) AS TotalValue
-FROM 
-    [SalesOrderLine] AS sol
-    INNER JOIN [SalesOrder] AS so ON so.[SalesOrderID] = sol.[SalesOrderID]
-    INNER JOIN [Customer] AS cust ON cust.[CustomerID] = so.[CustomerID]
-	inner join [item] as i on i.ItemID = sol.ItemID
-	inner join [ItemPackaging] as ip on ip.ItemPackagingID = sol.ItemPackagingID
-    INNER JOIN [ManagementPortal].[dbo].[Item] AS itm ON itm.Code = i.ItemCode
-WHERE 
-    CONVERT(DATE, sol.[CreatedDate]) = CAST(GETDATE() AS DATE)
-    AND cust.[CustomerCode] <> 'FAI101';
-"""
-    if not dollars:
-        query = """
--- Calculate the total value of orders entered today excluding specified customer
-SELECT 
-    SUM(ip.ConversionUnits * sol.QtyOrdered) AS TotalValue
-FROM 
-    [SalesOrderLine] AS sol
-    INNER JOIN [SalesOrder] AS so ON so.[SalesOrderID] = sol.[SalesOrderID]
-    INNER JOIN [Customer] AS cust ON cust.[CustomerID] = so.[CustomerID]
-	inner join [item] as i on i.ItemID = sol.ItemID
-	inner join [ItemPackaging] as ip on ip.ItemPackagingID = sol.ItemPackagingID
-    INNER JOIN [ManagementPortal].[dbo].[Item] AS itm ON itm.Code = i.ItemCode
-WHERE 
-    CONVERT(DATE, sol.[CreatedDate]) = CAST(GETDATE() AS DATE)
-    AND cust.[CustomerCode] <> 'FAI101;
-        """
-    cursor.execute(query)
-    rows = cursor.fetchall()
+    with data_source.get_source().orders_placed_today(dollars) as cursor:
+        rows = cursor.fetchall()
     for row in rows:
         return row.TotalValue
     return Decimal(0.0)
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
-def get_raw_order_data(dollars: bool = False) -> List[models.OrderLine]:
-    logging.info("Connecting to database")
-    logging.info(f"connect string: {configs.read_connect_string}")
-    cnxn = pyodbc.connect(configs.read_connect_string)
-    logging.info("Connected to database")
-    cursor = cnxn.cursor()
-    query = """
-SET NOCOUNT ON;
-SELECT 
-    itm.ItemCode, 
-    sol.QtyOrdered, 
-    ipkg.ConversionUnits, 
-    CONVERT(VARCHAR(10), sol.DateRequired, 120) AS DateRequired,
-    CASE 
-        WHEN si.SiteName = '11 Warehouse' THEN '90 Prosperity'
-        WHEN si.SiteName = '17 Warehouse' THEN '90 Prosperity'
-        ELSE si.SiteName 
-    END AS SiteName
-FROM 
-    SalesOrderLine AS sol
-INNER JOIN 
-    SalesOrder AS so ON so.SalesOrderID = sol.SalesOrderID
-INNER JOIN 
-    EntityTypeTransactionStatus AS ets ON ets.EntityTypeTransactionStatusID = so.EntityTypeTransactionStatusID
-INNER JOIN 
-    Item AS itm ON itm.ItemID = sol.ItemID
-INNER JOIN 
-    ItemPackaging AS ipkg ON ipkg.ItemPackagingID = sol.ItemPackagingID
-INNER JOIN
-    Site as si on si.SiteID = so.SiteID
-INNER JOIN
-    Customer as cu on cu.CustomerID = so.CustomerID
-WHERE 
-    sol.DateRequired < GETDATE()
-    AND sol.DateRequired > DATEADD(year, -7, GETDATE())
-    AND ets.IsCancelled = 0 
-    AND ets.IsOnHold = 0
-    AND sol.QtyOrdered > 0
-    AND cu.CustomerCode != 'FAI101'
-	AND si.SiteName not like '%SAMPLE%';
+# Loaded order history in eaches, kept between refreshes so that only the
+# trailing ORDER_RECHECK_DAYS need to be fetched again
+_order_history: Optional[OrderStore] = None
+
+# (item codes, item costs, unit value array) of the last priced order history
+_unit_values: Tuple = (None, None, None)
+
+def years_ago(years: int) -> date:
+    today = date.today()
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:
+        # 29th of February
+        return today.replace(year=today.year - years, day=28)
+
+
+def clear_order_history():
+    """Forgets the loaded order history so the next refresh is a full extract."""
+    global _order_history
+    _order_history = None
+
+
+def get_raw_order_data(dollars: bool = False) -> OrderStore:
     """
-    orders: List[models.OrderLine] = []
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    if dollars:
-        item_costs: Dict[str, Decimal] = get_item_costs()
-    for row in rows:
-        if dollars == False or row.ItemCode in item_costs:
-            qty_or_value = (
-                int(
-                    int(row.QtyOrdered * row.ConversionUnits) * item_costs[row.ItemCode]
-                )
-                if dollars
-                else int(row.QtyOrdered * row.ConversionUnits)
-            )
-        order_line = models.OrderLine(
-            code=row.ItemCode,
-            base_qty=qty_or_value,
-            date=row.DateRequired,
-            site=row.SiteName,
+    The order history in eaches, or valued at item cost when dollars is set.
+
+    Both come from the one cached quantity history. Dollar values are
+    computed from it on the fly, so they always use the current item costs.
+    """
+    orders = get_order_quantities()
+    if not dollars:
+        return orders
+    return orders.priced(unit_values(orders.item_codes))
+
+
+def unit_values(item_codes: List[str]) -> np.ndarray:
+    """Cost of one each of every item in item_codes, NaN for items without a cost."""
+    global _unit_values
+    item_costs = get_item_costs()
+    cached_codes, cached_costs, values = _unit_values
+    if cached_codes is item_codes and cached_costs is item_costs:
+        return values
+    values = np.array(
+        [float(item_costs.get(code, np.nan)) for code in item_codes], dtype=np.float64
+    )
+    _unit_values = (item_codes, item_costs, values)
+    return values
+
+
+@time_limited_cache(max_age_seconds=CACHE_SECONDS, stale_seconds=STALE_SECONDS)
+def get_order_quantities() -> OrderStore:
+    global _order_history
+    previous = _order_history
+    if previous is None or len(previous) == 0 or not configs.incremental_refresh:
+        orders = fetch_order_lines()
+    else:
+        # re-fetch a trailing window past the watermark, as recent lines
+        # can still be cancelled, put on hold or have their quantity changed
+        since_day = previous.watermark - configs.order_recheck_days
+        delta = fetch_order_lines(since_day=since_day)
+        orders = previous.merge(delta, since_day)
+        logging.info(
+            f"Merged {len(delta)} order lines required from "
+            f"{from_day_ordinal(since_day)} into history"
         )
-        orders.append(order_line)
+    orders = orders.after(to_day_ordinal(years_ago(7).isoformat()))
+    _order_history = orders
     logging.info(f"Qty orders retreived: {len(orders)}")
     return orders
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+def fetch_order_lines(since_day: Optional[int] = None) -> OrderStore:
+    since = None if since_day is None else from_day_ordinal(since_day)
+    source = data_source.get_source()
+    # the forecasts only need daily totals, so let the database sum them
+    extract = source.order_days if configs.aggregate_orders else source.order_lines
+    builder = OrderStoreBuilder()
+    with extract(since) as cursor:
+        # encode each batch into the store's columns as it arrives
+        for rows in data_source.fetch_batches(cursor):
+            builder.add(
+                [row.ItemCode for row in rows],
+                [int(row.QtyOrdered * row.ConversionUnits) for row in rows],
+                [row.DateRequired for row in rows],
+                [row.SiteName for row in rows],
+            )
+    return builder.build()
+
+
+@time_limited_cache(max_age_seconds=CACHE_SECONDS, stale_seconds=STALE_SECONDS)
 def get_item_costs() -> Dict[str, Decimal]:
-    cnxn = pyodbc.connect(configs.read_connect_string)
-    cursor = cnxn.cursor()
-    query = """
-SELECT [t0].[Code], [t0].[AvgPriceAUDEach], [t0].[ListPriceAUDEach]
-FROM [ManagementPortal].[dbo].[Item] AS [t0]
-    """
-    cursor.execute(query)
-    rows = cursor.fetchall()
+    with data_source.get_source().item_costs() as cursor:
+        rows = cursor.fetchall()
     item_costs = {}
     for row in rows:
         cost = None
@@ -158,91 +148,274 @@ FROM [ManagementPortal].[dbo].[Item] AS [t0]
 # WAIT TIMES
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+# Loaded despatch lines per years argument, newest first, kept between
+# refreshes so that only the trailing WAIT_RECHECK_DAYS need to be fetched again
+_wait_history: Dict[int, List[models.WaitDatabaseLine]] = {}
+
+# Item costs the loaded despatch lines were priced with, per years argument
+_wait_costs: Dict[int, Dict[str, Decimal]] = {}
+
+# Callables notified after each refresh of the raw wait data with the sets of
+# item codes and customer codes whose lines changed, or (None, None) when
+# everything should be treated as changed. They are called once the new lines
+# are cached, so anything they rebuild from get_raw_wait_data sees them.
+wait_data_listeners: List[Callable[[Optional[Set[str]], Optional[Set[str]]], None]] = []
+
+# (changed item codes, changed customer codes) of each refresh not yet
+# reported to wait_data_listeners, per years argument
+_wait_changes: Dict[int, Tuple[Optional[Set[str]], Optional[Set[str]]]] = {}
+
+def clear_wait_history():
+    """Forgets the loaded despatch lines so the next refresh is a full extract."""
+    _wait_history.clear()
+    _wait_costs.clear()
+    _wait_changes.clear()
+
+
+def wait_line_signature(line: models.WaitDatabaseLine) -> tuple:
+    return (
+        line.item_code,
+        line.customer_code,
+        line.site,
+        line.cda,
+        line.qty_eaches_sent,
+        line.date_str,
+        line.required_str,
+        line.sales_territory,
+        line.item_category,
+        line.item_type,
+        line.item_category_parent,
+    )
+
+
+def report_wait_changes(wait_times: List[models.WaitDatabaseLine], years: int = 7):
+    """Notifies wait_data_listeners of the refresh whose lines were just cached."""
+    # lines primed into the cache rather than loaded count as all changed
+    changed_items, changed_customers = _wait_changes.pop(years, (None, None))
+    for listener in wait_data_listeners:
+        listener(changed_items, changed_customers)
+
+
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, stale_seconds=STALE_SECONDS, on_store=report_wait_changes
+)
 def get_raw_wait_data(years: int = 7) -> List[models.WaitDatabaseLine]:
-    print("Connecting to database")
-    print("Connecting to database")
-    print("Connecting to database")
-    cnxn = pyodbc.connect(configs.read_connect_string)
-    cursor = cnxn.cursor()
-    query = """
--- Select the relevant columns with calculated quantity in each
-SELECT 
-cast(cdl.ProcessedDate as date) as ProcessedDate, 
-i.ItemCode, 
-c.CustomerCode, 
-cdl.QtyDespatched * ip.ConversionUnits AS QtyEachDespatched, 
-s.SiteName, 
-cast(sol.DateRequired as date) as DateRequired,
-cd.CustomerDespatchNo,
-st.SalesTerritoryName
-,cat.EntityClassificationCategoryDisplayName as ItemCategory
-,parent.EntityClassificationCategoryDisplayName as ItemCategoryParent
-,typ.EntityClassificationTypeDisplayName as ItemType
-FROM 
-CustomerDespatchLine AS cdl
-INNER JOIN EntityTypeTransactionStatus AS etts ON etts.EntityTypeTransactionStatusID = cdl.EntityTypeTransactionStatusID
-INNER JOIN Item AS i ON i.ItemID = cdl.ItemID
-INNER JOIN ItemPackaging AS ip ON ip.ItemPackagingID = cdl.ItemPackagingID
-INNER JOIN CustomerDespatch AS cd ON cd.CustomerDespatchID = cdl.CustomerDespatchID
-INNER JOIN Customer AS c ON cd.CustomerID = c.CustomerID
-INNER JOIN Site AS s ON s.SiteID = cd.SiteID
-LEFT OUTER JOIN SalesOrderLine AS sol ON sol.SalesOrderLineID = cdl.SalesOrderLineID
-LEFT OUTER JOIN CustomerInvoiceLine as cil on cil.CustomerDespatchLineID = cdl.CustomerDespatchLineID
-LEFT OUTER JOIN SalesTerritory as st on st.SalesTerritoryID = cil.SalesTerritoryID
-INNER JOIN ItemDivision as id on id.ItemID = i.ItemID and id.DivisionID = 1
-INNER JOIN EntityClassificationCategory as cat on id.EntityClassificationCategoryID = cat.EntityClassificationCategoryID
-INNER JOIN EntityClassificationType as typ on typ.EntityClassificationTypeID = id.EntityClassificationTypeID
-INNER JOIN EntityClassificationCategory as parent on parent.EntityClassificationCategoryID = cat.ParentEntityClassificationCategoryID
-WHERE 
-etts.IsDespatched = 1 
-AND c.CustomerCode != 'FAI101'
-AND cdl.QtyDespatched > 0
-AND s.SiteName not like '%SAMPLE%'
-AND cdl.ProcessedDate IS NOT NULL 
-AND cdl.ProcessedDate > DATEADD(year, -7, GETDATE())
-ORDER BY
-cdl.ProcessedDate desc
-"""
-    cursor.execute(query)
-    rows = cursor.fetchall()
+    previous = _wait_history.get(years)
+    item_costs = get_item_costs()
+    if not previous or not configs.incremental_refresh:
+        wait_times = fetch_wait_lines(item_costs=item_costs)
+        changed_items, changed_customers = None, None
+    else:
+        # lines are newest first, so the recheck window is a prefix of the list
+        since = (
+            date.fromisoformat(previous[0].date_str)
+            - timedelta(days=configs.wait_recheck_days)
+        ).isoformat()
+        window = 0
+        while window < len(previous) and previous[window].date_str >= since:
+            window += 1
+        fresh = fetch_wait_lines(since=since, item_costs=item_costs)
+        # the kept lines were priced when they were fetched, so follow any
+        # cost that has changed since
+        kept, repriced = reprice_wait_lines(
+            previous[window:], _wait_costs.get(years, {}), item_costs
+        )
+        wait_times = fresh + kept
+        # only the lines that differ from the previous load count as changed
+        changes = Counter(wait_line_signature(line) for line in fresh)
+        changes.subtract(wait_line_signature(line) for line in previous[:window])
+        changed = [signature for signature, count in changes.items() if count != 0]
+        changed_items = {signature[0] for signature in changed}
+        changed_customers = {signature[1] for signature in changed}
+        for line in repriced:
+            changed_items.add(line.item_code)
+            changed_customers.add(line.customer_code)
+        logging.info(
+            f"Refreshed {len(fresh)} despatch lines processed from {since}, "
+            f"{len(changed)} changed, {len(repriced)} re-priced"
+        )
+    cutoff = years_ago(years).isoformat()
+    while wait_times and wait_times[-1].date_str <= cutoff:
+        wait_times.pop()
+    _wait_history[years] = wait_times
+    _wait_costs[years] = item_costs
+    _wait_changes[years] = (changed_items, changed_customers)
+    return wait_times
+
+
+def fetch_wait_lines(
+    since: Optional[str] = None, item_costs: Optional[Dict[str, Decimal]] = None
+) -> List[models.WaitDatabaseLine]:
+    if item_costs is None:
+        item_costs = get_item_costs()
     wait_times: List[models.WaitDatabaseLine] = []
-    for row in rows:
-        qty_each_despatched = row.QtyEachDespatched
-        if qty_each_despatched < 0:
-            logging.warning(f"Calculated negative QtyEachDespatched ({qty_each_despatched}) for Item {row.ItemCode}, CDA {row.CustomerDespatchNo}. Using 0 instead. Check ConversionUnits for ItemPackaging.")
-            qty_each_despatched = 0
-            
-        wait_time_line = models.WaitDatabaseLine(
-            site=(
-                "90 Prosperity"
-                if row.SiteName.startswith("11") or row.SiteName.startswith("17")
-                else row.SiteName
-            ),
-            item_code=row.ItemCode,
-            customer_code=row.CustomerCode,
-            wait_time_days=(
-                parse_date(row.ProcessedDate) - parse_date(row.DateRequired)
-            ).days,
-            qty_eaches_sent=qty_each_despatched,
-            date_required=row.DateRequired,
-            date_despatched=row.ProcessedDate,
-            date_str=to_iso8601_date(row.ProcessedDate),
+    with data_source.get_source().wait_lines(since) as cursor:
+        for rows in data_source.fetch_batches(cursor):
+            wait_times.extend(wait_lines_from_rows(rows, item_costs))
+    return wait_times
+
+
+def reprice_wait_lines(
+    lines: List[models.WaitDatabaseLine],
+    priced_with: Dict[str, Decimal],
+    item_costs: Dict[str, Decimal],
+) -> Tuple[List[models.WaitDatabaseLine], List[models.WaitDatabaseLine]]:
+    """
+    lines with the est value of each item whose cost differs between
+    priced_with and item_costs worked out again, and the lines that were.
+
+    Re-priced lines are copies, so lists already handed out keep the values
+    they were served with.
+    """
+    if priced_with is item_costs:
+        return lines, []
+    changed_codes = {
+        code
+        for code in priced_with.keys() | item_costs.keys()
+        if priced_with.get(code) != item_costs.get(code)
+    }
+    if not changed_codes:
+        return lines, []
+    repriced = []
+    kept = []
+    for line in lines:
+        if line.item_code in changed_codes:
+            line = dataclasses.replace(
+                line,
+                est_value=float(line.qty_eaches_sent)
+                * float(item_costs.get(line.item_code, 0)),
+            )
+            repriced.append(line)
+        kept.append(line)
+    return kept, repriced
+
+
+def wait_lines_from_rows(
+    rows: list, item_costs: Dict[str, Decimal]
+) -> List[models.WaitDatabaseLine]:
+    """
+    Builds the despatch lines of one fetched batch.
+
+    Wait days, dates, day, month and year are derived a column at a time
+    with datetime64 arithmetic, and estimated values by joining the batch's
+    item codes against an array of their costs. Lines share one object per
+    distinct day and per distinct code or category string, rather than each
+    holding its own copy of values repeated across thousands of lines.
+    """
+    if not rows:
+        return []
+    processed = days_since_epoch(rows, "ProcessedDate")
+    required = days_since_epoch(rows, "DateRequired")
+    wait_days = np.maximum((processed - required).astype(np.int64), 0)
+    despatch_days, despatch_ids = np.unique(processed, return_inverse=True)
+    required_days, required_ids = np.unique(required, return_inverse=True)
+    months = despatch_days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+    days = (despatch_days - months).astype(np.int64) + 1
+    months = months.astype(np.int64) % 12 + 1
+
+    qtys = [row.QtyEachDespatched for row in rows]
+    for i in np.flatnonzero(np.array(qtys, dtype=np.float64) < 0).tolist():
+        logging.warning(f"Calculated negative QtyEachDespatched ({qtys[i]}) for Item {rows[i].ItemCode}, CDA {rows[i].CustomerDespatchNo}. Using 0 instead. Check ConversionUnits for ItemPackaging.")
+        qtys[i] = 0
+    codes, code_ids = np.unique([row.ItemCode for row in rows], return_inverse=True)
+    costs = np.array([float(item_costs.get(code, 0)) for code in codes.tolist()])
+    est_values = np.array(qtys, dtype=np.float64) * costs[code_ids]
+
+    sites = {
+        name: intern("90 Prosperity" if name.startswith("11") or name.startswith("17") else name)
+        for name in {row.SiteName for row in rows}
+    }
+    return [
+        models.WaitDatabaseLine(
+            site=sites[row.SiteName],
+            item_code=intern(row.ItemCode),
+            customer_code=intern(row.CustomerCode),
+            wait_time_days=wait,
+            qty_eaches_sent=qty,
+            date_required=date_required,
+            date_despatched=date_despatched,
+            date_str=date_str,
             cda=row.CustomerDespatchNo,
-            month=parse_date(row.ProcessedDate).month,
-            year=parse_date(row.ProcessedDate).year,
-            day=parse_date(row.ProcessedDate).day,
-            required_str=to_iso8601_date(row.DateRequired),
-            sales_territory=row.SalesTerritoryName,
-            item_category=row.ItemCategory,
-            item_type=row.ItemType,
-            item_category_parent=row.ItemCategoryParent,
+            month=month,
+            year=year,
+            day=day,
+            required_str=required_str,
+            sales_territory=intern(row.SalesTerritoryName),
+            item_category=intern(row.ItemCategory),
+            item_type=intern(row.ItemType),
+            item_category_parent=intern(row.ItemCategoryParent),
+            est_value=est_value,
         )
-        wait_times.append(wait_time_line)
-    return wait_times
+        for (
+            row,
+            wait,
+            qty,
+            date_required,
+            date_despatched,
+            date_str,
+            month,
+            year,
+            day,
+            required_str,
+            est_value,
+        ) in zip(
+            rows,
+            wait_days.tolist(),
+            qtys,
+            per_row(required_days.astype(object), required_ids),
+            per_row(despatch_days.astype(object), despatch_ids),
+            per_row(np.datetime_as_string(despatch_days), despatch_ids),
+            per_row(months, despatch_ids),
+            per_row(years, despatch_ids),
+            per_row(days, despatch_ids),
+            per_row(np.datetime_as_string(required_days), required_ids),
+            est_values.tolist(),
+        )
+    ]
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    """The one shared copy of a string, for values repeated across many lines."""
+    return value if value is None else sys.intern(value)
+
+
+def per_row(values: np.ndarray, inverse: np.ndarray) -> list:
+    """values[inverse[i]] for each row, every row with the same value sharing one object."""
+    shared = np.empty(len(values), dtype=object)
+    shared[:] = values.tolist()
+    return shared[inverse].tolist()
+
+
+# date.toordinal() of 1970-01-01, where datetime64[D] counts from
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def days_since_epoch(rows: list, column: str) -> np.ndarray:
+    """A date, datetime or ISO 8601 string column of rows as datetime64[D]."""
+    values = [getattr(row, column) for row in rows]
+    if any(isinstance(x, str) for x in values):
+        # FreeTDS returns date columns as strings, which NumPy parses, with
+        # missing values as NaT
+        days = np.array(values, dtype="datetime64[D]")
+        missing = np.flatnonzero(np.isnat(days))
+        if not len(missing):
+            return days
+    else:
+        try:
+            ordinals = np.fromiter(
+                (x.toordinal() for x in values), dtype=np.int64, count=len(values)
+            )
+            return (ordinals - EPOCH_ORDINAL).astype("datetime64[D]")
+        except AttributeError:
+            missing = [i for i, x in enumerate(values) if x is None]
+            if not missing:
+                raise
+    raise ValueError(
+        f"Despatch line without a {column}, CDA {rows[missing[0]].CustomerDespatchNo}"
+    )
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
 def parse_date(date_value: Union[str, datetime, date, None]) -> datetime:
     if date_value is None:
         raise ValueError("None is not a valid date value")
@@ -258,7 +431,6 @@ def parse_date(date_value: Union[str, datetime, date, None]) -> datetime:
     raise TypeError(f"Unsupported date type: {type(date_value)}")
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
 def to_iso8601_date(input_value):
     """
     Convert input to ISO 8601 date string.
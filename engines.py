@@ -0,0 +1,145 @@
+"""
+Lightweight forecasting engines, vectorized with NumPy.
+
+Every engine takes a 2-D history matrix of daily quantities (series x days,
+oldest day first, all series ending on the same day) and forecasts every
+series at once, returning a (series x horizon) matrix. They are far cheaper
+than a Prophet fit and suit the long tail of slow moving SKUs.
+"""
+import itertools
+from typing import List
+
+import numpy as np
+
+ENGINES = ["prophet", "seasonal_naive", "holt_winters", "croston", "auto"]
+
+SEASON_DAYS = 7
+# history used to fit the smoothing engines; older days barely move the state
+FIT_DAYS = 730
+# auto picks croston when at least this share of recent days had no orders
+SPARSE_ZERO_SHARE = 0.5
+# and holt_winters when the recent average is below this many units a day
+LOW_VOLUME_PER_DAY = 1.0
+# smoothing parameter grid holt_winters searches per series
+HOLT_WINTERS_GRID = list(
+    itertools.product([0.05, 0.1, 0.2, 0.4], [0.0, 0.01], [0.05, 0.15])
+)
+DAMPING = 0.98
+CROSTON_ALPHA = 0.1
+
+
+def seasonal_naive(history: np.ndarray, horizon: int) -> np.ndarray:
+    """Repeats each series' last week."""
+    history = pad_to_season(history)
+    last_season = history[:, -SEASON_DAYS:]
+    repeats = -(-horizon // SEASON_DAYS)
+    return np.tile(last_season, repeats)[:, :horizon]
+
+
+def holt_winters(history: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Additive damped Holt-Winters with weekly seasonality.
+
+    Every series is smoothed with every (alpha, beta, gamma) in
+    HOLT_WINTERS_GRID in one pass, and each series keeps the parameters with
+    the lowest one step ahead squared error.
+    """
+    history = pad_to_season(history[:, -FIT_DAYS:]).astype(np.float64)
+    series, days = history.shape
+    grid = np.array(HOLT_WINTERS_GRID)
+    # one row per (series, parameter set)
+    y = np.repeat(history, len(grid), axis=0)
+    alpha, beta, gamma = [np.tile(grid[:, i], series) for i in range(3)]
+
+    level = y[:, :SEASON_DAYS].mean(axis=1)
+    trend = np.zeros(len(y))
+    season = y[:, :SEASON_DAYS] - level[:, None]
+    sse = np.zeros(len(y))
+    for t in range(SEASON_DAYS, days):
+        s = season[:, t % SEASON_DAYS]
+        error = y[:, t] - (level + DAMPING * trend + s)
+        sse += error**2
+        new_level = alpha * (y[:, t] - s) + (1 - alpha) * (level + DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+        season[:, t % SEASON_DAYS] = gamma * (y[:, t] - new_level) + (1 - gamma) * s
+        level = new_level
+
+    steps = np.arange(1, horizon + 1)
+    damped_steps = np.cumsum(DAMPING**steps)
+    season_index = (days + steps - 1) % SEASON_DAYS
+    forecasts = (
+        level[:, None] + trend[:, None] * damped_steps[None, :] + season[:, season_index]
+    )
+    best = sse.reshape(series, len(grid)).argmin(axis=1)
+    forecasts = forecasts.reshape(series, len(grid), horizon)[np.arange(series), best]
+    return np.clip(forecasts, 0, None)
+
+
+def croston(history: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Croston's method with the Syntetos-Boylan bias correction (SBA).
+
+    Demand sizes and the intervals between demands are smoothed separately,
+    and the flat forecast is their bias corrected ratio.
+    """
+    history = history[:, -FIT_DAYS:].astype(np.float64)
+    series, days = history.shape
+    nonzero = history > 0
+    counts = nonzero.sum(axis=1)
+    has_demand = counts > 0
+    size = np.where(has_demand, history.sum(axis=1) / np.maximum(counts, 1), 0)
+    interval = np.where(has_demand, days / np.maximum(counts, 1), 1)
+    since_last = np.ones(series)
+    for t in range(days):
+        demand = nonzero[:, t]
+        size = np.where(demand, size + CROSTON_ALPHA * (history[:, t] - size), size)
+        interval = np.where(
+            demand, interval + CROSTON_ALPHA * (since_last - interval), interval
+        )
+        since_last = np.where(demand, 1, since_last + 1)
+    rate = (1 - CROSTON_ALPHA / 2) * size / interval
+    return np.repeat(rate[:, None], horizon, axis=1)
+
+
+def choose_engines(history: np.ndarray) -> List[str]:
+    """Picks an engine per series for engine=auto."""
+    recent = history[:, -365:]
+    zero_share = (recent <= 0).mean(axis=1)
+    per_day = recent.mean(axis=1)
+    return [
+        "croston"
+        if zeros >= SPARSE_ZERO_SHARE
+        else "holt_winters"
+        if volume < LOW_VOLUME_PER_DAY
+        else "prophet"
+        for zeros, volume in zip(zero_share.tolist(), per_day.tolist())
+    ]
+
+
+def forecast(engine: str, history: np.ndarray, horizon: int) -> np.ndarray:
+    """Forecasts every row of history with one of the NumPy engines."""
+    if engine == "seasonal_naive":
+        return seasonal_naive(history, horizon)
+    if engine == "holt_winters":
+        return holt_winters(history, horizon)
+    if engine == "croston":
+        return croston(history, horizon)
+    raise ValueError(f"{engine} is not a NumPy engine")
+
+
+def pad_to_season(history: np.ndarray) -> np.ndarray:
+    # series shorter than a season are padded with leading zero days
+    if history.shape[1] >= SEASON_DAYS:
+        return history
+    padding = np.zeros((history.shape[0], SEASON_DAYS - history.shape[1]))
+    return np.hstack([padding, history])
+
+
+def history_matrix(histories: List[np.ndarray]) -> np.ndarray:
+    """Stacks histories ending on the same day, padding shorter ones with leading zeros."""
+    days = max([len(x) for x in histories] + [1])
+    matrix = np.zeros((len(histories), days))
+    for row, values in zip(matrix, histories):
+        if len(values):
+            row[-len(values):] = values
+    return matrix
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+
+# modules
+import configs
+
+# bump when the way models are configured or fitted changes, so stored models
+# fitted the old way are not reused
+MODEL_VERSION = 1
+
+
+def series_key(
+    item_code: Optional[str],
+    site_filter: Optional[str],
+    site_filter2: Optional[str],
+    dollars: bool,
+) -> str:
+    """File-name safe key for one forecast series."""
+    series = repr((MODEL_VERSION, item_code, site_filter, site_filter2, bool(dollars)))
+    return hashlib.sha1(series.encode()).hexdigest()
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash of a history dataframe's ds and y columns, up to its last nonzero day.
+
+    Histories are zero-filled through to today, so the days since the last
+    order are left out; otherwise a stored model would only match on the day
+    it was fitted. A model is reused until the series gets a new order.
+    """
+    y = df["y"].to_numpy(dtype=np.float64)
+    nonzero = np.flatnonzero(y)
+    end = nonzero[-1] + 1 if len(nonzero) else 0
+    digest = hashlib.sha256()
+    digest.update(df["ds"].to_numpy(dtype="datetime64[ns]")[:end].tobytes())
+    digest.update(y[:end].tobytes())
+    return digest.hexdigest()
+
+
+def model_path(key: str) -> str:
+    return os.path.join(configs.model_store_dir, f"{key}.json")
+
+
+def stored_fingerprint(key: str) -> Optional[str]:
+    """Fingerprint of the history the stored model for key was fitted on, if any."""
+    try:
+        with open(model_path(key)) as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+
+def load_stored(key: str) -> Optional[Tuple[Optional[str], Prophet]]:
+    """
+    The stored model for key and the fingerprint of the history it was
+    fitted on, if there is a readable one, reading the file once.
+    """
+    try:
+        with open(model_path(key)) as f:
+            stored = json.load(f)
+        return stored.get("fingerprint"), model_from_json(stored["model"])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError):
+        logging.warning(f"Ignoring unreadable stored model {model_path(key)}")
+        return None
+
+
+def previous_params(key: str) -> Optional[dict]:
+    """Fitted parameters of the stored model for key, whatever history it was fitted on."""
+    stored = load_stored(key)
+    return stored[1].params if stored else None
+
+
+def save_model(key: str, history_fingerprint: str, model: Union[Prophet, str]):
+    """
+    Writes a fitted model to the store, replacing any older one for key.
+
+    model may also be given already serialized with model_to_json.
+    """
+    os.makedirs(configs.model_store_dir, exist_ok=True)
+    if not isinstance(model, str):
+        model = model_to_json(model)
+    stored = {"fingerprint": history_fingerprint, "model": model}
+    # write to a temporary file first so readers never see a partial model
+    fd, temp_path = tempfile.mkstemp(dir=configs.model_store_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(stored, f)
+        os.replace(temp_path, model_path(key))
+    except OSError:
+        logging.exception(f"Could not store model {model_path(key)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -1,10 +1,25 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
 from typing import List, Optional
 
-# modules
-import e2_queries
+def slotted(cls):
+    """
+    Rebuilds a dataclass with __slots__ for its fields, as dataclass(slots=True)
+    does from Python 3.10, so millions of instances do not each hold a dict.
 
+    Field defaults are left out of the new class, where they would clash with
+    the slots; the generated __init__ keeps its own copy of them.
+    """
+    names = tuple(field.name for field in fields(cls))
+    namespace = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in names + ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+@slotted
 @dataclass
 class OrderLine:
     code: str
@@ -12,11 +27,13 @@ class OrderLine:
     date: str
     site: str
 
+@slotted
 @dataclass
 class OrderDay:
     date: str # 10 char ISO 8601
     qty: int
     
+@slotted
 @dataclass
 class WaitDatabaseLine:
     site: str
@@ -41,8 +58,13 @@ class WaitDatabaseLine:
     # after init
     def __post_init__(self):
         self.wait_time_days = max(0, self.wait_time_days)
-        self.est_value = self.qty_eaches_sent * e2_queries.get_item_costs().get(self.item_code, 0)
+        if self.est_value is None:
+            # imported here as e2_queries imports this module
+            import e2_queries
+
+            self.est_value = self.qty_eaches_sent * e2_queries.get_item_costs().get(self.item_code, 0)
 
+@slotted
 @dataclass
 class Wait:
     est_value: float
@@ -64,7 +86,7 @@ class WaitDate:
     
     def total_est_value(self):
         if not self.waits:
-            return 0
+            return self.est_value or 0
         if self.window_size and self.window_size > 0:
             return sum([wait.est_value for wait in self.waits]) / self.window_size
         return sum([wait.est_value for wait in self.waits])
@@ -107,6 +129,9 @@ class WaitDate:
        
     
     def __post_init__(self):
+        if self.est_value is not None:
+            # already worked out by the caller, e.g. for a smoothing window
+            return
         self.est_value = self.total_est_value()
         if self.mode == 'mean':
             self.wait_days = self.wait_weighted_avg()
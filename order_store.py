@@ -0,0 +1,263 @@
+import copy
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# modules
+from day_series import DaySeries, from_day_ordinal, to_day_ordinal
+
+
+class OrderStore:
+    """
+    Sales order lines held column-wise in NumPy arrays.
+
+    Item codes and sites are dictionary encoded, dates are stored as integer
+    day ordinals (days since 1970-01-01) and rows are sorted by item and then
+    day. offsets[i]:offsets[i + 1] is the row range of item id i, so looking
+    up one item costs the size of its history rather than the whole table.
+    """
+
+    def __init__(
+        self,
+        item_codes: List[str],
+        sites: List[str],
+        item_ids: np.ndarray,
+        site_ids: np.ndarray,
+        days: np.ndarray,
+        qtys: np.ndarray,
+    ):
+        order = np.lexsort((days, item_ids))
+        self.item_codes = item_codes
+        self.item_index: Dict[str, int] = {
+            code: i for i, code in enumerate(item_codes)
+        }
+        self.sites = sites
+        self.item_ids = item_ids[order].astype(np.int32)
+        self.site_ids = site_ids[order].astype(np.int32)
+        self.days = days[order].astype(np.int32)
+        self.qtys = qtys[order].astype(np.int64)
+        self.offsets = np.searchsorted(
+            self.item_ids, np.arange(len(item_codes) + 1), side="left"
+        )
+        # per item id value of one unit when priced, see priced()
+        self.unit_values: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_columns(
+        cls,
+        codes: Sequence[str],
+        qtys: Sequence[int],
+        dates: Sequence[str],
+        sites: Sequence[str],
+    ) -> "OrderStore":
+        """Builds a store from parallel lists of item codes, quantities, ISO dates and sites."""
+        builder = OrderStoreBuilder()
+        builder.add(codes, qtys, dates, sites)
+        return builder.build()
+
+    @classmethod
+    def empty(cls) -> "OrderStore":
+        none = np.zeros(0, dtype=np.int64)
+        return cls([], [], none, none, none, none)
+
+    def __len__(self) -> int:
+        return len(self.qtys)
+
+    def _rows(self, item_code: Optional[str]) -> slice:
+        if not item_code:
+            return slice(0, len(self.qtys))
+        item_id = self.item_index.get(item_code)
+        if item_id is None:
+            return slice(0, 0)
+        return slice(self.offsets[item_id], self.offsets[item_id + 1])
+
+    def _site_mask(
+        self, site_ids: np.ndarray, site_filter: Optional[str], site_filter2: Optional[str]
+    ) -> Optional[np.ndarray]:
+        # site filters are substring matches, so resolve them against the
+        # handful of distinct site names and compare ids per row
+        if not site_filter:
+            return None
+        wanted = [
+            i
+            for i, site in enumerate(self.sites)
+            if site_filter in site or (site_filter2 and site_filter2 in site)
+        ]
+        return np.isin(site_ids, wanted)
+
+    def daily_totals(
+        self,
+        item_code: Optional[str] = None,
+        site_filter: Optional[str] = None,
+        site_filter2: Optional[str] = None,
+        end_day: Optional[int] = None,
+    ) -> Optional[DaySeries]:
+        """
+        Sums quantities (or values when priced) per day for one item, or all
+        items when item_code is empty.
+
+        Returns a DaySeries of the daily totals from the first matching order,
+        running through end_day if given, or None if there are no matching
+        orders.
+        """
+        rows = self._rows(item_code)
+        mask = self._site_mask(self.site_ids[rows], site_filter, site_filter2)
+        return self._bin_days(*self._day_weights(rows, mask), end_day)
+
+    def daily_totals_many(
+        self,
+        item_codes: Sequence[str],
+        site_filter: Optional[str] = None,
+        site_filter2: Optional[str] = None,
+        end_day: Optional[int] = None,
+    ) -> Dict[str, Optional[DaySeries]]:
+        """daily_totals for several items, matching the site filters only once."""
+        mask = self._site_mask(self.site_ids, site_filter, site_filter2)
+        results = {}
+        for item_code in item_codes:
+            rows = self._rows(item_code)
+            rows_mask = mask[rows] if mask is not None else None
+            results[item_code] = self._bin_days(*self._day_weights(rows, rows_mask), end_day)
+        return results
+
+    def _day_weights(
+        self, rows: slice, mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Days and quantities (values when priced) of the rows in mask."""
+        days = self.days[rows]
+        weights = self.qtys[rows]
+        if self.unit_values is not None:
+            weights = weights * self.unit_values[self.item_ids[rows]]
+            # items without a unit value are left out rather than counted as zero
+            priced = ~np.isnan(weights)
+            mask = priced if mask is None else mask & priced
+        if mask is not None:
+            days = days[mask]
+            weights = weights[mask]
+        return days, weights
+
+    @staticmethod
+    def _bin_days(
+        days: np.ndarray, qtys: np.ndarray, end_day: Optional[int]
+    ) -> Optional[DaySeries]:
+        if len(days) == 0:
+            return None
+        totals = DaySeries.binned(days, qtys)
+        if end_day is not None:
+            totals = totals.align(totals.first_day, end_day)
+        return DaySeries(totals.first_day, np.rint(totals.values).astype(np.int64))
+
+    def priced(self, unit_values: np.ndarray) -> "OrderStore":
+        """
+        A view of the store whose totals are values rather than quantities.
+
+        unit_values holds the value of one unit per item id, NaN for items to
+        leave out. The view shares the store's columns, so it costs no more
+        memory than unit_values.
+        """
+        view = copy.copy(self)
+        view.unit_values = unit_values
+        return view
+
+    def active_items(self, since_day: int) -> List[str]:
+        """Item codes with at least one order on or after since_day."""
+        # rows are sorted by day within each item, so an item's last row is its latest order
+        has_rows = self.offsets[1:] > self.offsets[:-1]
+        last_rows = self.offsets[1:][has_rows] - 1
+        item_ids = np.nonzero(has_rows)[0][self.days[last_rows] >= since_day]
+        return [self.item_codes[i] for i in item_ids.tolist()]
+
+    @property
+    def watermark(self) -> int:
+        """The latest day ordinal held in the store."""
+        return int(self.days.max())
+
+    def _select(self, rows: np.ndarray) -> "OrderStore":
+        return OrderStore(
+            self.item_codes,
+            self.sites,
+            self.item_ids[rows],
+            self.site_ids[rows],
+            self.days[rows],
+            self.qtys[rows],
+        )
+
+    def after(self, day: int) -> "OrderStore":
+        """Returns the rows dated strictly after day."""
+        if len(self.days) == 0 or self.days.min() > day:
+            return self
+        return self._select(self.days > day)
+
+    def merge(self, newer: "OrderStore", since_day: int) -> "OrderStore":
+        """
+        Replaces every row from since_day onwards with the rows of newer.
+
+        newer is expected to hold a fresh extract of exactly that date range.
+        """
+        item_codes = self.item_codes + [
+            code for code in newer.item_codes if code not in self.item_index
+        ]
+        site_index = {site: i for i, site in enumerate(self.sites)}
+        sites = self.sites + [site for site in newer.sites if site not in site_index]
+        site_index = {site: i for i, site in enumerate(sites)}
+        item_index = {code: i for i, code in enumerate(item_codes)}
+        # translate the newer store's dictionary ids into the merged dictionaries
+        item_map = np.array([item_index[code] for code in newer.item_codes], dtype=np.int32)
+        site_map = np.array([site_index[site] for site in newer.sites], dtype=np.int32)
+        keep = self.days < since_day
+        return OrderStore(
+            item_codes,
+            sites,
+            np.concatenate([self.item_ids[keep], item_map[newer.item_ids]]),
+            np.concatenate([self.site_ids[keep], site_map[newer.site_ids]]),
+            np.concatenate([self.days[keep], newer.days]),
+            np.concatenate([self.qtys[keep], newer.qtys]),
+        )
+
+
+class OrderStoreBuilder:
+    """
+    Builds an OrderStore from batches of order lines as they are fetched.
+
+    Each batch is dictionary encoded into NumPy columns when added, so the
+    caller can drop its rows straight away instead of holding the whole
+    extract in Python objects.
+    """
+
+    def __init__(self):
+        self.item_index: Dict[str, int] = {}
+        self.site_index: Dict[str, int] = {}
+        self.chunks: List[Tuple[np.ndarray, ...]] = []
+
+    def add(
+        self,
+        codes: Sequence[str],
+        qtys: Sequence[int],
+        dates: Sequence[str],
+        sites: Sequence[str],
+    ):
+        """Adds parallel lists of item codes, quantities, ISO dates and sites."""
+        if not codes:
+            return
+        item_index, site_index = self.item_index, self.site_index
+        item_ids = np.fromiter(
+            (item_index.setdefault(code, len(item_index)) for code in codes),
+            dtype=np.int32,
+            count=len(codes),
+        )
+        site_ids = np.fromiter(
+            (site_index.setdefault(site, len(site_index)) for site in sites),
+            dtype=np.int32,
+            count=len(sites),
+        )
+        days = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+        self.chunks.append((item_ids, site_ids, days, np.array(qtys, dtype=np.int64)))
+
+    def build(self) -> OrderStore:
+        if not self.chunks:
+            return OrderStore.empty()
+        item_ids, site_ids, days, qtys = [np.concatenate(column) for column in zip(*self.chunks)]
+        self.chunks = []
+        return OrderStore(
+            list(self.item_index), list(self.site_index), item_ids, site_ids, days, qtys
+        )
@@ -0,0 +1,145 @@
+"""
+Fits forecasts for every active item ahead of time, across all cores.
+
+Run nightly from cron with `python precompute.py`, or set PRECOMPUTE_HOUR and
+pred_app.py schedules it in the background. Only series whose order history
+changed since their stored model was fitted are refit.
+
+Run from cron, the refit models are only written to the model store. A
+running pred_app.py keeps serving the forecasts it has cached until they
+expire after CACHE_SECONDS, and loads the new models as it recomputes them.
+"""
+import argparse
+import datetime
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from joblib import Parallel, delayed
+from prophet.serialize import model_to_json
+
+# modules
+import configs
+import e2_queries
+import model_store
+import predictions
+from day_series import to_day_ordinal
+
+
+def fit_to_json(key: str, df: pd.DataFrame) -> str:
+    """Fits a model in a worker process, warm started from the stored one, and returns it serialized."""
+    return model_to_json(predictions.fit_model(df, model_store.previous_params(key)))
+
+
+def series_to_precompute(
+    dollars: bool,
+) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    order_store = e2_queries.get_raw_order_data(dollars=dollars)
+    since = datetime.date.today() - datetime.timedelta(days=configs.precompute_active_days)
+    item_codes = order_store.active_items(to_day_ordinal(since.isoformat()))
+    site_filters = [(None, None)] + configs.precompute_site_filters
+    return [
+        (item_code, site_filter, site_filter2)
+        for item_code in item_codes
+        for site_filter, site_filter2 in site_filters
+    ]
+
+
+def precompute_forecasts(dollars: bool = False, n_jobs: int = -1, prime: bool = False) -> int:
+    """
+    Refits every active series whose history changed. Returns how many were refit.
+
+    With prime, as when scheduled in the service, the refit series' forecasts
+    are also computed and cached for get_predictions, so their first requests
+    do not have to load the model and predict.
+    """
+    started = time.time()
+    order_store = e2_queries.get_raw_order_data(dollars=dollars)
+    stale = []
+    for item_code, site_filter, site_filter2 in series_to_precompute(dollars):
+        order_history = predictions.orders_from_store(
+            order_store, item_code, site_filter, site_filter2
+        )
+        if not order_history:
+            continue
+        df = predictions.history_frame(order_history)
+        key = model_store.series_key(item_code, site_filter, site_filter2, dollars)
+        history_fingerprint = model_store.fingerprint(df)
+        if model_store.stored_fingerprint(key) != history_fingerprint:
+            stale.append(((item_code, site_filter, site_filter2), key, history_fingerprint, df))
+    logging.info(f"Precomputing {len(stale)} forecasts")
+
+    fitted = Parallel(n_jobs=n_jobs)(
+        delayed(fit_to_json)(key, df) for _, key, _, df in stale
+    )
+    for (_, key, history_fingerprint, _), model_json in zip(stale, fitted):
+        model_store.save_model(key, history_fingerprint, model_json)
+
+    refit = {series for series, *_ in stale}
+    forecasts = {}
+    if prime:
+        for item_code, site_filter, site_filter2 in refit:
+            try:
+                forecasts[(item_code, site_filter, site_filter2)] = (
+                    predictions.get_forecast.__wrapped__(
+                        item_code,
+                        site_filter=site_filter,
+                        site_filter2=site_filter2,
+                        dollars=dollars,
+                        horizon=predictions.MAX_FORECAST_DAYS,
+                    )
+                )
+            except Exception:
+                logging.exception(f"Could not forecast {item_code} from its refit model")
+
+    # drop cached forecasts of refit series so the next request loads the new
+    # model; this only reaches the cache of the process running the precompute
+    predictions.get_forecast.invalidate(
+        lambda arguments: arguments["dollars"] == dollars
+        and (arguments["item_code"], arguments["site_filter"], arguments["site_filter2"])
+        in refit
+    )
+    for (item_code, site_filter, site_filter2), forecast in forecasts.items():
+        # same argument shape as the get_forecast call in get_predictions
+        predictions.get_forecast.prime(
+            forecast,
+            item_code,
+            site_filter=site_filter,
+            site_filter2=site_filter2,
+            dollars=dollars,
+            horizon=predictions.MAX_FORECAST_DAYS,
+            engine="prophet",
+        )
+    logging.info(f"Precomputed {len(stale)} forecasts in {time.time() - started:.0f}s")
+    return len(stale)
+
+
+def run_nightly(hour: int):
+    while True:
+        now = datetime.datetime.now()
+        next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += datetime.timedelta(days=1)
+        time.sleep((next_run - now).total_seconds())
+        try:
+            precompute_forecasts(prime=True)
+        except Exception:
+            logging.exception("Nightly forecast precompute failed")
+
+
+def schedule_nightly(hour: int):
+    """Runs precompute_forecasts every day at hour on a background thread."""
+    threading.Thread(
+        target=run_nightly, args=(hour,), name="precompute", daemon=True
+    ).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dollars", action="store_true", help="fit dollar valued series")
+    parser.add_argument("--jobs", type=int, default=-1, help="worker processes, -1 for all cores")
+    args = parser.parse_args()
+    precompute_forecasts(dollars=args.dollars, n_jobs=args.jobs)
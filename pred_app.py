@@ -1,14 +1,19 @@
 import datetime
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional
-from flask import Flask, request
+from flask import Flask, Response, request
 
 # modules
 import configs
 import logging
 import e2_queries
+import engines
 import predictions
 import models
+import warm_up
+from cache import render_metrics
 from wait_days import (
     get_smooth_wait_dates,
     get_wait_days_with_missing,
@@ -20,16 +25,41 @@ logging.basicConfig(level=logging.INFO)
 
 app = Flask(__name__)
 
+# Fits for /batch requests. Threads are enough as Prophet fits run in a CmdStan subprocess
+batch_pool = ThreadPoolExecutor(
+    max_workers=configs.batch_workers, thread_name_prefix="batch"
+)
+
 logging.getLogger("prophet").setLevel(logging.DEBUG)
 logging.getLogger("cmdstanpy").setLevel(logging.DEBUG)
 
 
+@app.before_request
+def start_warm_up():
+    # run directly the warm-up starts with the service, but under a WSGI
+    # server such as waitress-serve it starts with the first request
+    warm_up.start()
+
+
 @app.route("/")
 def base_url():
     # handles base case with no item code
     return get_order(None)
 
 
+@app.route("/metrics")
+def metrics():
+    """Cache hit, miss and compute time metrics in Prometheus text format."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/ready")
+def readiness():
+    """200 once the startup warm-up has loaded the data, 503 until then."""
+    ready = warm_up.ready.is_set()
+    return {"ready": ready, "steps": warm_up.status()}, 200 if ready else 503
+
+
 def to_bool(value):
     """Converts a string to a boolean if necessary."""
     return value.lower() == "true" if isinstance(value, str) else bool(value)
@@ -107,6 +137,7 @@ def wait_times(item_code: Optional[str] = None):
             category,
             item_type,
             parent,
+            show_waits,
         )
     else:
         wait_dates = get_wait_days_with_missing(
@@ -127,7 +158,7 @@ def wait_times(item_code: Optional[str] = None):
                 {
                     "date": x.date,
                     "waits": [
-                        {"qty": y.qty, "wait_time_days": y.wait_time_days}
+                        {"qty": y.est_value, "wait_time_days": y.wait_time_days}
                         for y in x.waits
                     ],
                 }
@@ -143,6 +174,84 @@ def wait_times(item_code: Optional[str] = None):
     }
 
 
+@app.route("/batch", methods=["POST"])
+def batch_orders():
+    """
+    Forecasts many items in one request.
+
+    Takes a JSON body of {"item_codes": [...]} and the days, site_filter,
+    site_filter2, dollars, total_only and engine query parameters of
+    /<item_code>. Responds with one JSON object per line (NDJSON), in the
+    order the forecasts complete.
+    """
+    body = request.get_json(force=True, silent=True) or {}
+    item_codes = body.get("item_codes", []) if isinstance(body, dict) else None
+    if not isinstance(item_codes, list) or not all(isinstance(x, str) for x in item_codes):
+        return {"error": "item_codes must be a list of strings"}, 400
+    item_codes = [x for x in item_codes if x]
+    days = request.args.get("days", default=30, type=int)
+    total_only = request.args.get("total_only", default=False, type=to_bool)
+    dollars = request.args.get("dollars", default=False, type=to_bool)
+    site_filter = request.args.get("site_filter", default=None, type=str)
+    if site_filter == "-NONE-":
+        site_filter = None
+    site_filter2 = request.args.get("site_filter2", default=None, type=str)
+    engine = request.args.get("engine", default="prophet", type=str)
+    if engine not in engines.ENGINES:
+        return {"error": f"unknown engine {engine}"}, 400
+
+    # build every item's history in a single pass over the order data
+    orders_by_item = predictions.get_orders_many(
+        item_codes, site_filter=site_filter, site_filter2=site_filter2, dollars=dollars
+    )
+
+    # the NumPy engines forecast every item in one batched computation
+    batched = {}
+    if engine != "prophet":
+        batched = predictions.get_predictions_many(orders_by_item, days, engine)
+
+    def forecast(item_code):
+        if item_code in batched:
+            predictions_model = batched[item_code]
+        else:
+            predictions_model = predictions.get_predictions(
+                item_code=item_code,
+                days=days,
+                site_filter=site_filter,
+                site_filter2=site_filter2,
+                dollars=dollars,
+            )
+        total = max(0, sum([x[1] for x in predictions_model]))
+        if total_only:
+            return {"item_code": item_code, "total": int(total)}
+        return {
+            "item_code": item_code,
+            "days": days,
+            "predictions": predictions_model,
+            "prediction_period_total": total,
+            "past_orders_total": sum([x.qty for x in orders_by_item[item_code]]),
+        }
+
+    futures = {
+        batch_pool.submit(forecast, item_code): item_code
+        for item_code in item_codes
+        if item_code not in batched
+    }
+
+    def results():
+        for item_code in batched:
+            yield json.dumps(forecast(item_code)) + "\n"
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.exception(f"Batch forecast for {futures[future]} failed")
+                result = {"item_code": futures[future], "error": str(e)}
+            yield json.dumps(result) + "\n"
+
+    return Response(results(), mimetype="application/x-ndjson")
+
+
 @app.route("/<item_code>")
 def get_order(item_code):
     # Default parameters
@@ -162,7 +271,9 @@ def get_order(item_code):
         )
     if reload_cache:
         predictions.get_orders.clear_cache()
-        e2_queries.get_raw_order_data.clear_cache()
+        e2_queries.get_order_quantities.clear_cache()
+        e2_queries.clear_order_history()
+        e2_queries.clear_wait_history()
         print("Cleared cache")
         print("Cleared cache")
         print("Cleared cache")
@@ -184,6 +295,9 @@ def get_order(item_code):
     if site_filter == "-NONE-":
         site_filter = None
     site_filter2 = request.args.get("site_filter2", default=None, type=str)
+    engine = request.args.get("engine", default="prophet", type=str)
+    if engine not in engines.ENGINES:
+        return {"error": f"unknown engine {engine}", "engines": engines.ENGINES}, 400
 
     logging.info(f"days: {days}")
     logging.info(f"future_orders_only: {future_orders_only}")
@@ -205,6 +319,7 @@ def get_order(item_code):
             site_filter=site_filter,
             site_filter2=site_filter2,
             dollars=dollars,
+            engine=engine,
         )
         logging.info(f"predictions_model created: {len(predictions_model)}")
 
@@ -253,6 +368,13 @@ def get_order(item_code):
 
 if __name__ == "__main__":
 
+    warm_up.start()
+
+    if configs.precompute_hour:
+        import precompute
+
+        precompute.schedule_nightly(int(configs.precompute_hour))
+
     # PRODUCTION ENVIRONMENT
     if os.name == "posix":
         # app.run(host='0.0.0.0', port=8099, debug=True)
@@ -5,13 +5,17 @@ import datetime
 import pandas as pd
 import numpy as np
 from prophet import Prophet
-from typing import List
+from typing import Dict, List, Optional
 
 # modules
 import e2_queries
+import engines
+import model_store
 import models
 from cache import time_limited_cache
-from cache import CACHE_SECONDS
+from cache import CACHE_SECONDS, STALE_SECONDS
+from day_series import DaySeries, to_day_ordinal
+from order_store import OrderStore
 
 import logging
 
@@ -23,68 +27,78 @@ logging.getLogger("cmdstanpy").setLevel(logging.ERROR)
 os.environ["CMDSTAN_PRINT_STDOUT"] = "0"
 os.environ["STAN_THREADS"] = "0"
 
+# Forecasts are computed this far ahead once and sliced for shorter horizons
+MAX_FORECAST_DAYS = 365
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
-def generate_date_range(start_date: str, end_date: str) -> List[str]:
-    """Generates a list of dates from start_date to end_date in ISO 8601 format."""
-    start = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-    return [
-        (start + datetime.timedelta(days=i)).strftime("%Y-%m-%d")
-        for i in range((end - start).days + 1)
-    ]
 
-
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, max_entries=2000, max_bytes=512 * 1024 * 1024
+)
 def get_orders(
     item_code: str,
     site_filter: str = None,
     site_filter2: str = None,
     dollars: bool = False,
 ) -> List[models.OrderDay]:
-    # Get raw order data
-    raw_data = e2_queries.get_raw_order_data(dollars=dollars)
+    # Get the columnar order store
+    order_store = e2_queries.get_raw_order_data(dollars=dollars)
+    return orders_from_store(order_store, item_code, site_filter, site_filter2)
 
-    # Filter raw data for the specified item code
-    if item_code:
-        filtered_data = [order for order in raw_data if order.code == item_code]
-    else:
-        filtered_data = raw_data
-    if site_filter and not site_filter2:
-        filtered_data = [order for order in filtered_data if site_filter in order.site]
-    if site_filter and site_filter2:
-        filtered_data = [
-            order
-            for order in filtered_data
-            if site_filter in order.site or site_filter2 in order.site
-        ]
-
-    # Group orders by date and sum the quantities
-    grouped_data = {}
-    for order in filtered_data:
-        if order.date in grouped_data:
-            grouped_data[order.date] += order.base_qty
-        else:
-            grouped_data[order.date] = order.base_qty
-
-    # Determine the start date and end date
-    if grouped_data:
-        start_date = min(grouped_data.keys())
-        end_date = datetime.datetime.now().strftime("%Y-%m-%d")
-
-        # Generate all dates within the range
-        all_dates = generate_date_range(start_date, end_date)
-
-        # Ensure all dates in the range have an entry
-        full_data = {date: grouped_data.get(date, 0) for date in all_dates}
-    else:
-        # If no orders, return empty list
-        return []
 
-    # Convert the grouped data to a list of OrderDay objects
-    orders = [models.OrderDay(date=date, qty=qty) for date, qty in full_data.items()]
+def orders_from_store(
+    order_store: OrderStore,
+    item_code: str,
+    site_filter: str = None,
+    site_filter2: str = None,
+) -> List[models.OrderDay]:
+    # Sum the item's orders per day, through to today
+    today = to_day_ordinal(datetime.datetime.now().strftime("%Y-%m-%d"))
+    daily = order_store.daily_totals(
+        item_code, site_filter=site_filter, site_filter2=site_filter2, end_day=today
+    )
+    return order_days(daily)
 
-    return orders
+
+def get_orders_many(
+    item_codes: List[str],
+    site_filter: str = None,
+    site_filter2: str = None,
+    dollars: bool = False,
+) -> Dict[str, List[models.OrderDay]]:
+    """get_orders for several items from one pass over the order store.
+
+    The histories are also primed into get_orders' cache, so forecasting
+    the items afterwards does not rebuild them.
+    """
+    order_store = e2_queries.get_raw_order_data(dollars=dollars)
+    today = to_day_ordinal(datetime.datetime.now().strftime("%Y-%m-%d"))
+    dailies = order_store.daily_totals_many(
+        item_codes, site_filter=site_filter, site_filter2=site_filter2, end_day=today
+    )
+    orders_by_item = {}
+    for item_code, daily in dailies.items():
+        orders = order_days(daily)
+        # same argument shape as the get_orders call in get_forecast
+        get_orders.prime(
+            orders,
+            item_code,
+            site_filter=site_filter,
+            site_filter2=site_filter2,
+            dollars=dollars,
+        )
+        orders_by_item[item_code] = orders
+    return orders_by_item
+
+
+def order_days(daily: Optional[DaySeries]) -> List[models.OrderDay]:
+    if daily is None:
+        # If no orders, return empty list
+        return []
+    # dates only become strings here, for the responses and Prophet's ds column
+    return [
+        models.OrderDay(date=date, qty=qty)
+        for date, qty in zip(daily.date_strings(), daily.values.tolist())
+    ]
 
 
 def smooth_predictions(data, smoothing_days):
@@ -119,18 +133,8 @@ def smooth_predictions(data, smoothing_days):
     return smoothed_data
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
-def get_predictions(
-    item_code: str,
-    days: int = 30,
-    site_filter: str = None,
-    site_filter2: str = None,
-    dollars: bool = False,
-) -> List[tuple]:
-    order_history = get_orders(
-        item_code, site_filter=site_filter, site_filter2=site_filter2, dollars=dollars
-    )
-
+def history_frame(order_history: List[models.OrderDay]) -> pd.DataFrame:
+    """Builds the daily ds/y dataframe Prophet is fitted on."""
     # Create a dataframe from the order history
     df = pd.DataFrame(
         {
@@ -154,17 +158,86 @@ def get_predictions(
         end_date = datetime.datetime.now()
 
     idx = pd.date_range(start_date, end_date)
-    df = df.reindex(idx, fill_value=0).reset_index().rename(columns={"index": "ds"})
+    return df.reindex(idx, fill_value=0).reset_index().rename(columns={"index": "ds"})
+
+
+def warm_start_params(params: dict) -> dict:
+    """Converts a fitted model's params into Stan optimizer init values."""
+    return {
+        "k": params["k"][0][0],
+        "m": params["m"][0][0],
+        "sigma_obs": params["sigma_obs"][0][0],
+        "delta": params["delta"][0],
+        "beta": params["beta"][0],
+    }
+
+
+def fit_model(df: pd.DataFrame, previous_params: Optional[dict] = None) -> Prophet:
+    # Start the optimizer from the previous fit's parameters when we have them,
+    # as the history has usually only gained a few days since
+    if previous_params is not None:
+        try:
+            model = Prophet()
+            model.fit(df, init=warm_start_params(previous_params))
+            return model
+        except Exception as e:
+            # e.g. seasonalities changed shape as the history grew, or no convergence
+            logging.info(f"Warm started fit failed, fitting from scratch: {e}")
 
     # Initialize the Prophet model
     model = Prophet()
 
     # Fit the model with the data
     model.fit(df)
+    return model
 
-    # Create a dataframe to store future dates for prediction
+
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS,
+    stale_seconds=STALE_SECONDS,
+    max_entries=5000,
+    max_bytes=256 * 1024 * 1024,
+)
+def get_forecast(
+    item_code: str,
+    site_filter: str = None,
+    site_filter2: str = None,
+    dollars: bool = False,
+    horizon: int = MAX_FORECAST_DAYS,
+    engine: str = "prophet",
+) -> List[tuple]:
+    """Fits (or loads) the series' model once and forecasts horizon days ahead."""
+    order_history = get_orders(
+        item_code, site_filter=site_filter, site_filter2=site_filter2, dollars=dollars
+    )
+
+    df = history_frame(order_history)
     last_date = df["ds"].max()
-    future_dates = model.make_future_dataframe(periods=days, include_history=False)
+
+    if engine == "auto":
+        engine = engines.choose_engines(df["y"].to_numpy()[None, :])[0]
+    if engine != "prophet":
+        forecast = engines.forecast(engine, df["y"].to_numpy()[None, :], horizon)[0]
+        return list(zip(forecast_dates(last_date, horizon), forecast.tolist()))
+
+    # Reuse a stored model fitted on the same history, otherwise fit and store one
+    key = model_store.series_key(item_code, site_filter, site_filter2, dollars)
+    history_fingerprint = model_store.fingerprint(df)
+    stored = model_store.load_stored(key)
+    if stored is not None and stored[0] == history_fingerprint:
+        model = stored[1]
+    else:
+        # warm started from the stored model fitted on an older history
+        model = fit_model(df, stored[1].params if stored else None)
+        model_store.save_model(key, history_fingerprint, model)
+
+    # Create a dataframe to store future dates for prediction. A stored model
+    # may have been fitted before the latest days without orders, so its
+    # future starts that many days before ours.
+    unfitted_days = (last_date - model.history_dates.max()).days
+    future_dates = model.make_future_dataframe(
+        periods=horizon + unfitted_days, include_history=False
+    )
     future_dates = future_dates[future_dates["ds"] > last_date]
 
     # Use the model to make predictions
@@ -176,6 +249,72 @@ def get_predictions(
     return predictions
 
 
+def forecast_dates(last_date: pd.Timestamp, horizon: int) -> List[str]:
+    first = np.datetime64(last_date.date(), "D") + 1
+    return np.arange(first, first + horizon).astype(str).tolist()
+
+
+def get_predictions(
+    item_code: str,
+    days: int = 30,
+    site_filter: str = None,
+    site_filter2: str = None,
+    dollars: bool = False,
+    engine: str = "prophet",
+) -> List[tuple]:
+    # A forecast's values do not depend on its horizon, so every horizon up to
+    # MAX_FORECAST_DAYS is a slice of the same cached forecast
+    days = max(0, days)
+    forecast = get_forecast(
+        item_code,
+        site_filter=site_filter,
+        site_filter2=site_filter2,
+        dollars=dollars,
+        horizon=max(days, MAX_FORECAST_DAYS),
+        engine=engine,
+    )
+    return forecast[:days]
+
+
+def get_predictions_many(
+    orders_by_item: Dict[str, List[models.OrderDay]],
+    days: int = 30,
+    engine: str = "auto",
+) -> Dict[str, List[tuple]]:
+    """
+    Forecasts many items with the NumPy engines, batching items whose
+    forecasts can be computed together.
+
+    Histories come from get_orders_many. With engine=auto, items auto picks
+    Prophet for are left out of the result for the caller to forecast.
+    """
+    # Padding a shorter history with zeros would change its forecast, so items
+    # are batched with others of the same history length. The engines look
+    # back at most FIT_DAYS, so every history at least that long is one batch.
+    histories = {
+        item_code: np.array([x.qty for x in orders])
+        for item_code, orders in orders_by_item.items()
+    }
+    by_length: Dict[int, List[str]] = {}
+    for item_code, values in histories.items():
+        by_length.setdefault(min(len(values), engines.FIT_DAYS), []).append(item_code)
+    dates = forecast_dates(pd.Timestamp(datetime.date.today()), max(0, days))
+    results = {}
+    for length, item_codes in by_length.items():
+        history = engines.history_matrix(
+            [histories[code][len(histories[code]) - length :] for code in item_codes]
+        )
+        chosen = (
+            engines.choose_engines(history) if engine == "auto" else [engine] * len(item_codes)
+        )
+        for name in set(chosen) - {"prophet"}:
+            rows = [i for i, x in enumerate(chosen) if x == name]
+            forecasts = engines.forecast(name, history[rows], max(0, days))
+            for row, forecast in zip(rows, forecasts.tolist()):
+                results[item_codes[row]] = list(zip(dates, forecast))
+    return results
+
+
 if __name__ == "__main__":
     # Create a synthetic dataset: dates and corresponding values
     df = pd.DataFrame(
@@ -0,0 +1,250 @@
+"""
+Seeded synthetic data shaped like the service's real data, for benchmarks
+and tests that must run without the database.
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# modules
+import models
+
+SITES = [
+    "90 Prosperity",
+    "WA Warehouse",
+    "QLD Warehouse",
+    "SA Warehouse",
+    "NZ Warehouse",
+    "Rotterdam Warehouse",
+]
+SALES_TERRITORIES = ["NSW", "VIC", "QLD", "WA", "SA", "TAS", "NT", "NZ", "EXPORT", None]
+ITEM_TYPES = ["Stock", "Indent", "Kit", "Consumable", "Spare"]
+
+
+def daily_demand(
+    rng: np.random.Generator,
+    days: int,
+    level: float = 20.0,
+    intermittency: float = 0.0,
+) -> np.ndarray:
+    """
+    Daily order quantities with trend, weekly and yearly seasonality.
+
+    intermittency is the share of days forced to zero, as for slow moving SKUs.
+    """
+    t = np.arange(days)
+    trend = 1 + rng.normal(0, 0.3) * t / 365
+    weekly = 1 + 0.4 * np.isin(t % 7, [0, 1, 2, 3, 4])
+    yearly = 1 + 0.3 * np.sin(2 * np.pi * (t + rng.integers(365)) / 365.25)
+    demand = rng.poisson(np.clip(level * trend * weekly * yearly, 0, None))
+    if intermittency:
+        demand[rng.random(days) < intermittency] = 0
+    return demand
+
+
+def history_frame(demand: np.ndarray, end: datetime.date = None) -> pd.DataFrame:
+    """A ds/y dataframe ending on end (default today), as predictions.history_frame builds."""
+    end = end or datetime.date.today()
+    ds = pd.date_range(end=pd.Timestamp(end), periods=len(demand), freq="D")
+    return pd.DataFrame({"ds": ds, "y": demand})
+
+
+def skewed_weights(rng: np.random.Generator, count: int) -> np.ndarray:
+    """Long tailed popularity, so a few SKUs and customers carry most lines."""
+    weights = rng.lognormal(0, 1.5, count)
+    return weights / weights.sum()
+
+
+def item_codes(items: int) -> List[str]:
+    return [f"ITM{i:06d}" for i in range(items)]
+
+
+def item_costs(rng: np.random.Generator, items: int) -> np.ndarray:
+    """Cost in dollars of one each of every item."""
+    return rng.lognormal(2, 1.2, items).round(2)
+
+
+def line_days(rng: np.random.Generator, count: int, years: int, end: datetime.date) -> np.ndarray:
+    """Day ordinals spread over the last years, mostly on weekdays."""
+    last = int(np.datetime64(end, "D").astype(np.int64))
+    days = rng.integers(last - years * 365, last, count, endpoint=True)
+    # move most weekend lines onto the following Monday, 1970-01-01 was a Thursday
+    weekday = (days + 3) % 7
+    weekend = (weekday >= 5) & (rng.random(count) < 0.9)
+    return np.where(weekend, days + 7 - weekday, days).clip(max=last)
+
+
+def order_lines(
+    rng: np.random.Generator,
+    items: int,
+    years: int,
+    lines_per_item_year: int = 25,
+    end: datetime.date = None,
+) -> List[models.OrderLine]:
+    """Sales order lines in eaches, as the order extract returns them."""
+    end = end or datetime.date.today()
+    count = items * years * lines_per_item_year
+    codes = item_codes(items)
+    item_ids = rng.choice(items, count, p=skewed_weights(rng, items))
+    site_ids = rng.choice(len(SITES), count, p=skewed_weights(rng, len(SITES)))
+    qtys = rng.geometric(0.2, count) * rng.choice([1, 6, 12, 50], count, p=[0.6, 0.2, 0.15, 0.05])
+    dates = line_days(rng, count, years, end).astype("datetime64[D]").astype(str)
+    return [
+        models.OrderLine(code=codes[item], base_qty=qty, date=date, site=SITES[site])
+        for item, qty, date, site in zip(
+            item_ids.tolist(), qtys.tolist(), dates.tolist(), site_ids.tolist()
+        )
+    ]
+
+
+def wait_lines(
+    rng: np.random.Generator,
+    items: int,
+    years: int,
+    lines_per_item_year: int = 10,
+    end: datetime.date = None,
+    costs: np.ndarray = None,
+) -> List[models.WaitDatabaseLine]:
+    """Despatch lines newest first, as the wait extract returns them."""
+    end = end or datetime.date.today()
+    count = items * years * lines_per_item_year
+    codes = item_codes(items)
+    if costs is None:
+        costs = item_costs(rng, items)
+    # each item has one category, parent category and type
+    categories = rng.integers(0, 40, items)
+    item_types = rng.integers(0, len(ITEM_TYPES), items)
+    customers = [f"CUS{i:05d}" for i in range(max(50, items // 4))]
+
+    item_ids = rng.choice(items, count, p=skewed_weights(rng, items))
+    customer_ids = rng.choice(len(customers), count, p=skewed_weights(rng, len(customers)))
+    site_ids = rng.choice(len(SITES), count, p=skewed_weights(rng, len(SITES)))
+    territory_ids = rng.integers(0, len(SALES_TERRITORIES), count)
+    qtys = rng.geometric(0.2, count) * rng.choice([1, 6, 12], count, p=[0.7, 0.2, 0.1])
+    despatched = np.sort(line_days(rng, count, years, end))[::-1]
+    # most lines ship within days, a few wait on back orders for weeks
+    waits = np.where(
+        rng.random(count) < 0.9, rng.poisson(2, count), rng.geometric(0.03, count)
+    )
+    required = despatched - waits
+    despatched_dates = despatched.astype("datetime64[D]").astype(object).tolist()
+    required_dates = required.astype("datetime64[D]").astype(object).tolist()
+
+    lines = []
+    for i, (item, customer, site, territory, qty, wait) in enumerate(
+        zip(
+            item_ids.tolist(),
+            customer_ids.tolist(),
+            site_ids.tolist(),
+            territory_ids.tolist(),
+            qtys.tolist(),
+            waits.tolist(),
+        )
+    ):
+        date_despatched = despatched_dates[i]
+        lines.append(
+            models.WaitDatabaseLine(
+                site=SITES[site],
+                item_code=codes[item],
+                customer_code=customers[customer],
+                wait_time_days=wait,
+                qty_eaches_sent=qty,
+                date_required=required_dates[i],
+                date_despatched=date_despatched,
+                cda=f"CDA{count - i:08d}",
+                sales_territory=SALES_TERRITORIES[territory],
+                item_category=f"Category {categories[item]}",
+                item_type=ITEM_TYPES[item_types[item]],
+                item_category_parent=f"Category Group {categories[item] % 8}",
+                est_value=qty * float(costs[item]),
+                date_str=date_despatched.isoformat(),
+                required_str=required_dates[i].isoformat(),
+                day=date_despatched.day,
+                month=date_despatched.month,
+                year=date_despatched.year,
+            )
+        )
+    return lines
+
+
+def write_fixture(path: str, items: int, years: int, seed: int = 0):
+    """
+    Writes a SQLite fixture for DATA_SOURCE=sqlite, replacing any file at path.
+
+    Dates are relative to today, so rebuild the fixture now and then.
+    """
+    import data_source
+
+    rng = np.random.default_rng(seed)
+    costs = item_costs(rng, items)
+    orders = order_lines(rng, items, years)
+    waits = wait_lines(rng, items, years, costs=costs)
+    lead_days = rng.integers(0, 14, len(orders)).tolist()
+
+    if os.path.exists(path):
+        os.remove(path)
+    cnxn = sqlite3.connect(path)
+    try:
+        cnxn.executescript(data_source.SQLITE_SCHEMA)
+        cnxn.executemany(
+            "INSERT INTO order_lines VALUES (?, ?, 1, ?, ?, ?)",
+            (
+                (
+                    x.code,
+                    x.base_qty,
+                    x.date,
+                    x.site,
+                    (datetime.date.fromisoformat(x.date) - datetime.timedelta(days=lead)).isoformat(),
+                )
+                for x, lead in zip(orders, lead_days)
+            ),
+        )
+        # a tenth of the items only have a list price
+        no_average = rng.random(items) < 0.1
+        cnxn.executemany(
+            "INSERT INTO item_costs VALUES (?, ?, ?)",
+            zip(
+                item_codes(items),
+                np.where(no_average, 0, costs).tolist(),
+                costs.tolist(),
+            ),
+        )
+        cnxn.executemany(
+            "INSERT INTO wait_lines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    x.date_str,
+                    x.item_code,
+                    x.customer_code,
+                    x.qty_eaches_sent,
+                    x.site,
+                    x.required_str,
+                    x.cda,
+                    x.sales_territory,
+                    x.item_category,
+                    x.item_category_parent,
+                    x.item_type,
+                )
+                for x in waits
+            ),
+        )
+        cnxn.commit()
+    finally:
+        cnxn.close()
+    return len(orders), len(waits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes a synthetic SQLite fixture for DATA_SOURCE=sqlite.")
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="fixtures.sqlite", help="replaced if it exists")
+    args = parser.parse_args()
+    order_count, wait_count = write_fixture(args.output, args.items, args.years, args.seed)
+    print(f"Wrote {order_count} order lines and {wait_count} despatch lines to {args.output}")
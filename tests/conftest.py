@@ -0,0 +1,9 @@
+import os
+import sys
+
+# the modules live at the repository root, configs needs a data source that
+# does not require database credentials, and requests must not start loading
+# the datasets
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATA_SOURCE", "sqlite")
+os.environ.setdefault("WARM_UP", "false")
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from cache import approximate_size, shallow_size, time_limited_cache
+
+
+def test_on_store_runs_once_the_value_is_cached():
+    seen = []
+    calls = []
+
+    def on_store(value, n):
+        # a listener rebuilding from the cached function gets the new value
+        seen.append((value, cached(n)))
+
+    @time_limited_cache(max_age_seconds=60, on_store=on_store)
+    def cached(n):
+        calls.append(n)
+        return [n, len(calls)]
+
+    value = cached(1)
+    assert seen == [(value, value)]
+    assert calls == [1]
+
+    cached.prime(["primed"], 2)
+    assert seen[-1] == (["primed"], ["primed"])
+    assert calls == [1]
+
+
+def test_computes_once_while_the_key_is_discarded_between_callers():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    @time_limited_cache(max_age_seconds=60)
+    def cached(n):
+        calls.append(n)
+        started.set()
+        release.wait(5)
+        return n
+
+    first = threading.Thread(target=cached, args=(1,))
+    first.start()
+    started.wait(5)
+    # neither dropping the entry nor a sweep may take the lock from under
+    # the callers waiting on it
+    cached.invalidate(lambda arguments: True)
+    cached.sweep()
+    waiters = [threading.Thread(target=cached, args=(1,)) for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [first] + waiters:
+        thread.join(5)
+    assert calls == [1]
+
+
+def test_shallow_sized_views_do_not_count_the_shared_records():
+    records = [{"value": "x" * 1000} for _ in range(1000)]
+
+    @time_limited_cache(max_age_seconds=60, max_bytes=64 * 1024, sizer=shallow_size)
+    def view(start):
+        return {"lines": records[start:]}
+
+    first = view(0)
+    view(1)
+    # both views fit, so the first is still cached
+    assert view(0) is first
+    assert approximate_size(first) > 64 * 1024
@@ -0,0 +1,143 @@
+import sqlite3
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import configs
+import data_source
+import e2_queries
+import models
+
+
+def wait_line(
+    item_code: str, qty: int, cost: Decimal, despatched: date = date(2024, 3, 3)
+) -> models.WaitDatabaseLine:
+    required = despatched - timedelta(days=2)
+    return models.WaitDatabaseLine(
+        site="90 Prosperity",
+        item_code=item_code,
+        customer_code="C1",
+        wait_time_days=2,
+        qty_eaches_sent=qty,
+        date_required=required,
+        date_despatched=despatched,
+        cda="CDA1",
+        sales_territory="VIC",
+        item_category="Gloves",
+        item_type="Stock",
+        item_category_parent="PPE",
+        est_value=qty * float(cost),
+        date_str=despatched.isoformat(),
+        required_str=required.isoformat(),
+    )
+
+
+def test_reprice_wait_lines_follows_changed_costs():
+    priced_with = {"A": Decimal("2.5"), "B": Decimal("1")}
+    lines = [wait_line("A", 4, Decimal("2.5")), wait_line("B", 3, Decimal("1"))]
+    kept, repriced = e2_queries.reprice_wait_lines(
+        lines, priced_with, {"A": Decimal("3"), "B": Decimal("1")}
+    )
+    assert [x.est_value for x in kept] == [12.0, 3.0]
+    assert [x.item_code for x in repriced] == ["A"]
+    # the list already handed out keeps the values it was served with
+    assert lines[0].est_value == 10.0
+    assert kept[1] is lines[1]
+
+
+def test_reprice_wait_lines_prices_items_without_a_cost_at_zero():
+    lines = [wait_line("A", 4, Decimal("2.5"))]
+    kept, repriced = e2_queries.reprice_wait_lines(lines, {"A": Decimal("2.5")}, {})
+    assert kept[0].est_value == 0
+    assert repriced == kept
+
+
+def test_reprice_wait_lines_keeps_lines_when_costs_are_unchanged():
+    lines = [wait_line("A", 4, Decimal("2.5"))]
+    costs = {"A": Decimal("2.5")}
+    assert e2_queries.reprice_wait_lines(lines, costs, dict(costs)) == (lines, [])
+    assert e2_queries.reprice_wait_lines(lines, costs, costs) == (lines, [])
+
+
+@pytest.fixture
+def order_source(tmp_path, monkeypatch):
+    """Reads orders from a SQLite fixture of (item, qty, conversion units, days ago) lines."""
+
+    def write(lines):
+        path = str(tmp_path / "orders.sqlite")
+        cnxn = sqlite3.connect(path)
+        cnxn.executescript(data_source.SQLITE_SCHEMA)
+        cnxn.executemany(
+            "INSERT INTO order_lines VALUES (?, ?, ?, ?, '90 Prosperity', ?)",
+            [
+                (code, qty, units, (date.today() - timedelta(days=ago)).isoformat(), None)
+                for code, qty, units, ago in lines
+            ],
+        )
+        cnxn.commit()
+        cnxn.close()
+        monkeypatch.setattr(data_source, "_source", data_source.SqliteSource(path))
+
+    return write
+
+
+def daily_totals(monkeypatch, aggregate: bool, item_code: str) -> list:
+    monkeypatch.setattr(configs, "aggregate_orders", aggregate)
+    return e2_queries.fetch_order_lines().daily_totals(item_code).values.tolist()
+
+
+def test_aggregated_order_extract_matches_per_line_for_whole_eaches(order_source, monkeypatch):
+    order_source([("A", 2, 6, 3), ("A", 1, 12, 3), ("A", 5, 1, 1), ("B", 4, 1, 2)])
+    for item_code in ["A", "B"]:
+        assert daily_totals(monkeypatch, True, item_code) == daily_totals(
+            monkeypatch, False, item_code
+        )
+
+
+def test_aggregated_order_extract_truncates_fractional_eaches_per_day(order_source, monkeypatch):
+    # 1.5 eaches per line: truncated to 1 per line, or 3.0 summed over the day
+    order_source([("A", 0.5, 3, 2), ("A", 0.5, 3, 2), ("A", 2.5, 1, 1)])
+    per_line = daily_totals(monkeypatch, False, "A")
+    aggregated = daily_totals(monkeypatch, True, "A")
+    assert per_line == [2, 2]
+    assert aggregated == [3, 2]
+    # higher by less than one each per line
+    assert 0 <= sum(aggregated) - sum(per_line) < 3
+
+
+DespatchRow = namedtuple(
+    "DespatchRow",
+    "ProcessedDate ItemCode CustomerCode QtyEachDespatched SiteName DateRequired "
+    "CustomerDespatchNo SalesTerritoryName ItemCategory ItemCategoryParent ItemType",
+)
+
+
+def despatch_rows(dates) -> list:
+    return [
+        DespatchRow(
+            processed, "A", "C1", 4, "11 Prosperity", required, f"CDA{i}",
+            "VIC", "Gloves", "PPE", "Stock",
+        )
+        for i, (processed, required) in enumerate(dates)
+    ]
+
+
+def test_wait_lines_from_rows_reads_string_dates_as_date_objects():
+    dates = [(date(2024, 3, 3), date(2024, 3, 1)), (date(2024, 2, 29), date(2024, 3, 2))]
+    expected = e2_queries.wait_lines_from_rows(despatch_rows(dates), {"A": Decimal("2.5")})
+    # as FreeTDS returns cast(... as date) columns
+    as_strings = [(processed.isoformat(), required.isoformat()) for processed, required in dates]
+    lines = e2_queries.wait_lines_from_rows(despatch_rows(as_strings), {"A": Decimal("2.5")})
+    assert lines == expected
+    assert [(x.wait_time_days, x.date_str, x.day, x.month, x.year) for x in lines] == [
+        (2, "2024-03-03", 3, 3, 2024),
+        (0, "2024-02-29", 29, 2, 2024),
+    ]
+
+
+def test_wait_lines_from_rows_rejects_a_missing_string_date():
+    rows = despatch_rows([("2024-03-03", "2024-03-01"), (None, "2024-03-01")])
+    with pytest.raises(ValueError, match="without a ProcessedDate, CDA CDA1"):
+        e2_queries.wait_lines_from_rows(rows, {})
@@ -0,0 +1,39 @@
+import pandas as pd
+from prophet import Prophet
+
+import model_store
+
+
+def history(values, start="2024-01-01") -> pd.DataFrame:
+    return pd.DataFrame({"ds": pd.date_range(start, periods=len(values)), "y": values})
+
+
+def test_fingerprint_ignores_the_days_since_the_last_order():
+    fitted = model_store.fingerprint(history([3, 0, 5, 0]))
+    assert model_store.fingerprint(history([3, 0, 5, 0, 0, 0])) == fitted
+    assert model_store.fingerprint(history([3, 0, 5])) == fitted
+
+
+def test_fingerprint_changes_with_a_new_order():
+    fitted = model_store.fingerprint(history([3, 0, 5, 0]))
+    assert model_store.fingerprint(history([3, 0, 5, 0, 1])) != fitted
+    assert model_store.fingerprint(history([3, 0, 5, 0], start="2024-01-02")) != fitted
+
+
+def test_load_stored_returns_the_fingerprint_and_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store.configs, "model_store_dir", str(tmp_path))
+    model = Prophet(
+        yearly_seasonality=False, weekly_seasonality=False, daily_seasonality=False
+    ).fit(history(list(range(1, 31))))
+    model_store.save_model("key", "fingerprint", model)
+
+    fingerprint, loaded = model_store.load_stored("key")
+    assert fingerprint == "fingerprint"
+    assert loaded.params.keys() == model.params.keys()
+    assert model_store.load_stored("missing") is None
+
+
+def test_load_stored_ignores_an_unreadable_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store.configs, "model_store_dir", str(tmp_path))
+    (tmp_path / "key.json").write_text('{"fingerprint": "fingerprint"}')
+    assert model_store.load_stored("key") is None
@@ -0,0 +1,25 @@
+import dataclasses
+from datetime import date
+
+import models
+
+
+def test_records_have_slots_instead_of_a_dict():
+    for record in [
+        models.OrderLine("A", 1, "2024-03-01", "90 Prosperity"),
+        models.OrderDay("2024-03-01", 1),
+        models.Wait(1.0, 2),
+    ]:
+        assert not hasattr(record, "__dict__")
+        assert dataclasses.fields(record)
+
+
+def test_wait_database_line_keeps_its_defaults():
+    line = models.WaitDatabaseLine(
+        "90 Prosperity", "A", "C1", -1, 4, date(2024, 3, 3), date(2024, 3, 3),
+        "CDA1", "VIC", "Gloves", "Stock", "PPE", est_value=10.0,
+    )
+    assert not hasattr(line, "__dict__")
+    assert line.wait_time_days == 0
+    assert (line.est_value, line.date_str, line.year) == (10.0, None, None)
+    assert dataclasses.replace(line, est_value=12.0).est_value == 12.0
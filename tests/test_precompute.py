@@ -0,0 +1,26 @@
+import pandas as pd
+
+import model_store
+import precompute
+import predictions
+
+
+def test_in_process_precompute_primes_the_refit_forecasts(monkeypatch):
+    history = pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=3), "y": [1, 0, 2]})
+    forecast = [("2024-01-04", 1.5)]
+    monkeypatch.setattr(precompute.e2_queries, "get_raw_order_data", lambda dollars: None)
+    monkeypatch.setattr(precompute, "series_to_precompute", lambda dollars: [("A", None, None)])
+    monkeypatch.setattr(predictions, "orders_from_store", lambda *args: ["history"])
+    monkeypatch.setattr(predictions, "history_frame", lambda orders: history)
+    monkeypatch.setattr(model_store, "stored_fingerprint", lambda key: None)
+    monkeypatch.setattr(model_store, "save_model", lambda *args: None)
+    monkeypatch.setattr(precompute, "fit_to_json", lambda key, df: "{}")
+    monkeypatch.setattr(predictions.get_forecast, "__wrapped__", lambda *args, **kwargs: forecast)
+    predictions.get_forecast.clear_cache()
+
+    assert precompute.precompute_forecasts(n_jobs=1, prime=True) == 1
+
+    # answered from the cache, without loading the model on the request path
+    monkeypatch.setattr(predictions, "get_orders", None)
+    assert predictions.get_predictions("A", days=1) == forecast
+    predictions.get_forecast.clear_cache()
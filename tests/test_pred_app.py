@@ -0,0 +1,79 @@
+import datetime
+import threading
+from decimal import Decimal
+
+import pytest
+
+import pred_app
+import wait_days
+from test_e2_queries import wait_line
+
+
+@pytest.fixture
+def client():
+    return pred_app.app.test_client()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"item_codes": "ITM000001"},
+        {"item_codes": ["ITM000001", 2]},
+        {"item_codes": [["ITM000001"]]},
+        ["ITM000001"],
+    ],
+)
+def test_batch_rejects_item_codes_that_are_not_a_list_of_strings(client, body):
+    response = client.post("/batch", json=body)
+    assert response.status_code == 400
+    assert "item_codes" in response.get_json()["error"]
+
+
+def test_first_request_starts_the_warm_up_once(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(pred_app.warm_up, "_started", False)
+    monkeypatch.setattr(pred_app.warm_up.configs, "warm_up", True)
+    monkeypatch.setattr(pred_app.warm_up, "run_until_ready", lambda: started.append(1))
+    client.get("/metrics")
+    client.get("/metrics")
+    pred_app.warm_up.start()
+    for thread in threading.enumerate():
+        if thread.name == "warm-up":
+            thread.join(5)
+    assert started == [1]
+
+
+def test_batch_rejects_an_unknown_engine(client):
+    response = client.post("/batch?engine=prohpet", json={"item_codes": ["ITM000001"]})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "unknown engine prohpet"}
+
+
+def test_item_forecast_rejects_an_unknown_engine(client):
+    response = client.get("/ITM000001?engine=holtwinters")
+    assert response.status_code == 400
+    assert response.get_json() == {
+        "error": "unknown engine holtwinters",
+        "engines": pred_app.engines.ENGINES,
+    }
+
+
+def test_smoothed_wait_dates_show_the_window_waits(client):
+    today = datetime.date.today()
+    lines = [
+        wait_line("A", qty, Decimal("2.5"), today - datetime.timedelta(days=ago))
+        for qty, ago in [(4, 2), (2, 0)]
+    ]
+    pred_app.e2_queries.get_raw_wait_data.prime(lines)
+    try:
+        response = client.get("/wait/A?smoothing=1&show_waits=true")
+    finally:
+        pred_app.e2_queries.get_raw_wait_data.clear_cache()
+        wait_days.invalidate_wait_series(None, None)
+    assert response.status_code == 200
+    waits = [x["waits"] for x in response.get_json()["wait_dates"]]
+    assert waits == [
+        [{"qty": 10.0, "wait_time_days": 2}],
+        [{"qty": 10.0, "wait_time_days": 2}, {"qty": 5.0, "wait_time_days": 2}],
+        [{"qty": 5.0, "wait_time_days": 2}],
+    ]
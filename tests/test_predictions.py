@@ -0,0 +1,36 @@
+import datetime
+
+import numpy as np
+import pytest
+
+import engines
+import models
+import predictions
+
+
+def order_history(values) -> list:
+    today = datetime.date.today()
+    return [
+        models.OrderDay((today - datetime.timedelta(days=len(values) - 1 - i)).isoformat(), qty)
+        for i, qty in enumerate(values)
+    ]
+
+
+@pytest.mark.parametrize("engine", ["seasonal_naive", "holt_winters", "croston", "auto"])
+def test_batched_forecasts_match_forecasting_each_item_alone(engine):
+    rng = np.random.default_rng(0)
+    orders_by_item = {
+        "LONG": order_history(rng.poisson(2, engines.FIT_DAYS + 50).tolist()),
+        "YEAR": order_history(rng.poisson(3, 400).tolist()),
+        "NEW": order_history(rng.poisson(5, 20).tolist()),
+        "ALSO_NEW": order_history(rng.poisson(1, 20).tolist()),
+    }
+    batched = predictions.get_predictions_many(orders_by_item, days=14, engine=engine)
+    for item_code, orders in orders_by_item.items():
+        history = np.array([[x.qty for x in orders]], dtype=np.float64)
+        name = engines.choose_engines(history)[0] if engine == "auto" else engine
+        if name == "prophet":
+            assert item_code not in batched
+            continue
+        alone = engines.forecast(name, history, 14)[0]
+        assert [x[1] for x in batched[item_code]] == pytest.approx(alone.tolist())
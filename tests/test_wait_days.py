@@ -0,0 +1,38 @@
+import pytest
+
+import models
+import wait_days
+
+
+def wait_dates(mode: str) -> list:
+    return [
+        models.WaitDate("2024-03-01", [models.Wait(10.0, 2), models.Wait(5.0, 4)], mode=mode),
+        models.WaitDate("2024-03-02", [], mode=mode),
+        models.WaitDate("2024-03-03", [models.Wait(8.0, 1)], mode=mode),
+    ]
+
+
+def summary(smoothed: list) -> list:
+    return [(x.date, x.est_value, x.wait_days, x.window_size) for x in smoothed]
+
+
+@pytest.mark.parametrize("mode", ["mean", "median", "max", "min", "mode"])
+def test_negative_smoothing_smooths_each_day_alone(mode):
+    alone = summary(wait_days.smooth_wait_dates(wait_dates(mode), 0, mode))
+    assert summary(wait_days.smooth_wait_dates(wait_dates(mode), -1, mode)) == alone
+    assert summary(wait_days.smooth_wait_dates(wait_dates(mode), -5, mode)) == alone
+    assert [x[3] for x in alone] == [1, 1, 1]
+
+
+def test_smoothed_days_keep_the_window_waits_when_asked():
+    dates = wait_dates("mean")
+    smoothed = wait_days.smooth_wait_dates(dates, 1, "mean", keep_waits=True)
+    assert [x.waits for x in smoothed] == [
+        dates[0].waits,
+        dates[0].waits + dates[2].waits,
+        dates[2].waits,
+    ]
+    assert [x.est_value for x in smoothed] == [
+        x.est_value for x in wait_days.smooth_wait_dates(dates, 1, "mean")
+    ]
+    assert all(not x.waits for x in wait_days.smooth_wait_dates(dates, 1, "mean"))
@@ -1,11 +1,30 @@
 import datetime
+import threading
 from typing import List, Optional, Set
 
+import numpy as np
+
 # modules
 import models
-from cache import time_limited_cache, CACHE_SECONDS
+from cache import time_limited_cache, shallow_size, CACHE_SECONDS
 import e2_queries
-from predictions import generate_date_range
+from day_series import DaySeries, from_day_ordinals, to_day_ordinals
+from wait_index import WaitIndex
+from wait_window import WaitWindow
+
+
+_wait_index: Optional[WaitIndex] = None
+_wait_index_lock = threading.Lock()
+
+
+def get_wait_index() -> WaitIndex:
+    """Returns the inverted indexes for the current raw wait data, rebuilding them when it is refreshed."""
+    global _wait_index
+    raw_data = e2_queries.get_raw_wait_data()
+    with _wait_index_lock:
+        if _wait_index is None or _wait_index.lines is not raw_data:
+            _wait_index = WaitIndex(raw_data)
+        return _wait_index
 
 
 def get_wait_dates(
@@ -23,20 +42,42 @@ def get_wait_dates(
 
 
 def smooth_wait_dates(
-    wait_dates: List[models.WaitDate], smoothing: int, mode: str = "mean"
+    wait_dates: List[models.WaitDate],
+    smoothing: int,
+    mode: str = "mean",
+    keep_waits: bool = False,
 ) -> List[models.WaitDate]:
+    """
+    Each day's statistics over the days up to smoothing either side of it.
+
+    The window slides forward a day at a time, so each day's waits are added
+    and removed once. The smoothed days carry est_value and wait_days, and
+    the window's waits only with keep_waits, as copying them into every day
+    costs as much as rebuilding each window. A negative smoothing is taken
+    as zero.
+    """
+    smoothing = max(0, smoothing)
     smoothed_dates = []
     total_dates = len(wait_dates)
+    window = WaitWindow(wait_dates, mode)
+    start_index = end_index = 0
     for i in range(total_dates):
-        waits = []
-        start_index = max(0, i - smoothing)
-        end_index = min(total_dates, i + smoothing + 1)
-        for j in range(start_index, end_index):
-            waits.extend(wait_dates[j].waits)
+        while end_index < min(total_dates, i + smoothing + 1):
+            window.add(end_index)
+            end_index += 1
+        while start_index < max(0, i - smoothing):
+            window.remove(start_index)
+            start_index += 1
         smoothed_dates.append(
             models.WaitDate(
                 date=wait_dates[i].date,
-                waits=waits,
+                waits=(
+                    [wait for x in wait_dates[start_index:end_index] for wait in x.waits]
+                    if keep_waits
+                    else []
+                ),
+                est_value=window.est_value(),
+                wait_days=window.wait_days(),
                 mode=mode,
                 window_size=end_index - start_index,
             )
@@ -44,7 +85,13 @@ def smooth_wait_dates(
     return smoothed_dates
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+# the filtered lines are shared with get_raw_wait_data, so only the lists count
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS,
+    max_entries=500,
+    max_bytes=512 * 1024 * 1024,
+    sizer=shallow_size,
+)
 def get_filtered_data(
     item_code: Optional[str] = None,
     site_filter: Optional[str] = None,
@@ -54,40 +101,20 @@ def get_filtered_data(
     item_type: Optional[str] = None,
     parent: Optional[str] = None,
 ) -> List[models.WaitDatabaseLine]:
-    raw_data = e2_queries.get_raw_wait_data()
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.item_code == item_code] if item_code else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.site.startswith(site_filter)]
-        if site_filter
-        else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.customer_code == customer_code]
-        if customer_code
-        else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.sales_territory == sales_territory]
-        if sales_territory
-        else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.item_category == category] if category else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.item_type == item_type] if item_type else raw_data
-    )
-    raw_data: List[models.WaitDatabaseLine] = (
-        [x for x in raw_data if x.item_category_parent == parent]
-        if parent
-        else raw_data
+    return get_wait_index().filter(
+        item_code=item_code,
+        site_filter=site_filter,
+        customer_code=customer_code,
+        sales_territory=sales_territory,
+        category=category,
+        item_type=item_type,
+        parent=parent,
     )
-    return raw_data
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, max_entries=500, max_bytes=256 * 1024 * 1024
+)
 def get_sorted_wait_dates(
     item_code: str = None,
     site_filter: str = None,
@@ -112,7 +139,12 @@ def get_sorted_wait_dates(
     return wait_dates
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS,
+    max_entries=500,
+    max_bytes=256 * 1024 * 1024,
+    sizer=shallow_size,
+)
 def get_lines_only(
     item_code: str = None,
     site_filter: str = None,
@@ -140,7 +172,9 @@ def get_lines_only(
     return {"lines": raw_data[:limit]}
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, max_entries=500, max_bytes=256 * 1024 * 1024
+)
 def get_scatter_plot_data(
     item_code: str,
     customer_code: str,
@@ -171,12 +205,8 @@ def get_scatter_plot_data(
         item_type=item_type,
         parent=parent,
     )
-    one_year_ago = datetime.datetime.now() - datetime.timedelta(days=365)
-    raw_data = [
-        x
-        for x in raw_data
-        if e2_queries.parse_date(x.date_required).date() > one_year_ago.date()
-    ]
+    one_year_ago = (datetime.date.today() - datetime.timedelta(days=365)).isoformat()
+    raw_data = [x for x in raw_data if x.required_str > one_year_ago]
     groups = dict()
     for line in raw_data:
         key = getattr(line, type)
@@ -194,7 +224,9 @@ def get_scatter_plot_data(
     return results
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, max_entries=500, max_bytes=256 * 1024 * 1024
+)
 def get_wait_days_with_missing(
     item_code: str = None,
     site_filter: str = None,
@@ -216,19 +248,21 @@ def get_wait_days_with_missing(
         parent,
     )
 
+    if not wait_dates:
+        return wait_dates
     # insert missing days
-    if wait_dates:
-        start_date = wait_dates[0].date
-        end_date = wait_dates[-1].date
-        all_dates = generate_date_range(start_date, end_date)
-        all_dates = [x for x in all_dates if x not in [y.date for y in wait_dates]]
-        for date in all_dates:
-            wait_dates.append(models.WaitDate(date=date, waits=[], mode=mode))
-        wait_dates = sorted(wait_dates, key=lambda x: x.date)
-    return wait_dates
+    days = to_day_ordinals([x.date for x in wait_dates])
+    series = DaySeries.placed(days, wait_dates)
+    missing = np.setdiff1d(series.days(), days, assume_unique=True)
+    series.values[missing - series.first_day] = [
+        models.WaitDate(date=date, waits=[], mode=mode) for date in from_day_ordinals(missing)
+    ]
+    return series.values.tolist()
 
 
-@time_limited_cache(max_age_seconds=CACHE_SECONDS)
+@time_limited_cache(
+    max_age_seconds=CACHE_SECONDS, max_entries=500, max_bytes=256 * 1024 * 1024
+)
 def get_smooth_wait_dates(
     item_code: str = None,
     site_filter: str = None,
@@ -239,6 +273,7 @@ def get_smooth_wait_dates(
     category: str = None,
     item_type: str = None,
     parent: str = None,
+    show_waits: bool = False,
 ) -> List[models.WaitDate]:
     wait_days = get_wait_days_with_missing(
         item_code,
@@ -250,5 +285,33 @@ def get_smooth_wait_dates(
         item_type,
         parent,
     )
-    wait_days = smooth_wait_dates(wait_days, smoothing, mode)
+    wait_days = smooth_wait_dates(wait_days, smoothing, mode, keep_waits=show_waits)
     return wait_days
+
+
+def invalidate_wait_series(item_codes: Optional[Set[str]], customer_codes: Optional[Set[str]]):
+    """Drops the cached wait series that could include lines of the changed items or customers."""
+    if item_codes is not None and not item_codes and not customer_codes:
+        return
+
+    def affected(arguments) -> bool:
+        if item_codes is None:
+            return True
+        if arguments["item_code"] and arguments["item_code"] not in item_codes:
+            return False
+        if arguments["customer_code"] and arguments["customer_code"] not in customer_codes:
+            return False
+        return True
+
+    for cached in [
+        get_filtered_data,
+        get_sorted_wait_dates,
+        get_lines_only,
+        get_scatter_plot_data,
+        get_wait_days_with_missing,
+        get_smooth_wait_dates,
+    ]:
+        cached.invalidate(affected)
+
+
+e2_queries.wait_data_listeners.append(invalidate_wait_series)
@@ -0,0 +1,88 @@
+import bisect
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# models
+import models
+
+# attributes answered by exact match, in the order get_filtered_data takes them
+EXACT_DIMENSIONS = [
+    "item_code",
+    "customer_code",
+    "sales_territory",
+    "item_category",
+    "item_type",
+    "item_category_parent",
+]
+
+NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+class WaitIndex:
+    """
+    Inverted indexes over a list of wait lines.
+
+    Every exact-match dimension maps each value to the sorted array of row ids
+    holding it, and sites are kept in sorted order so a site prefix resolves to
+    a contiguous run of site values. A filter combination is answered by
+    intersecting the row id arrays, smallest first.
+    """
+
+    def __init__(self, lines: List[models.WaitDatabaseLine]):
+        self.lines = lines
+        self.indexes: Dict[str, Dict[str, np.ndarray]] = {}
+        for dimension in EXACT_DIMENSIONS + ["site"]:
+            row_ids: Dict[str, List[int]] = {}
+            for i, line in enumerate(lines):
+                row_ids.setdefault(getattr(line, dimension), []).append(i)
+            self.indexes[dimension] = {
+                value: np.array(ids, dtype=np.int64) for value, ids in row_ids.items()
+            }
+        self.sorted_sites = sorted(
+            site for site in self.indexes["site"] if site is not None
+        )
+
+    def rows_for_site_prefix(self, prefix: str) -> np.ndarray:
+        start = bisect.bisect_left(self.sorted_sites, prefix)
+        matches = []
+        for site in self.sorted_sites[start:]:
+            if not site.startswith(prefix):
+                break
+            matches.append(self.indexes["site"][site])
+        if not matches:
+            return NO_ROWS
+        if len(matches) == 1:
+            return matches[0]
+        return np.sort(np.concatenate(matches))
+
+    def filter(
+        self,
+        item_code: Optional[str] = None,
+        site_filter: Optional[str] = None,
+        customer_code: Optional[str] = None,
+        sales_territory: Optional[str] = None,
+        category: Optional[str] = None,
+        item_type: Optional[str] = None,
+        parent: Optional[str] = None,
+    ) -> List[models.WaitDatabaseLine]:
+        wanted = zip(
+            EXACT_DIMENSIONS,
+            [item_code, customer_code, sales_territory, category, item_type, parent],
+        )
+        candidates = [
+            self.indexes[dimension].get(value, NO_ROWS)
+            for dimension, value in wanted
+            if value
+        ]
+        if site_filter:
+            candidates.append(self.rows_for_site_prefix(site_filter))
+        if not candidates:
+            return self.lines
+        candidates.sort(key=len)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return [self.lines[i] for i in rows.tolist()]
@@ -0,0 +1,223 @@
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# models
+import models
+
+# weighted counts of the mode closer than this (relative) are ties, as running
+# sums differ from a fresh sum of the same waits in the last bits
+MODE_TIE_TOLERANCE = 1e-9
+
+
+class WaitWindow:
+    """
+    Wait statistics of a run of consecutive days, kept up to date as days
+    are added at the end and removed from the start.
+
+    The statistics are the ones models.WaitDate computes from all the waits
+    in the window, but each step only costs the waits of the days entering
+    or leaving it: running weighted sums for the mean, a Fenwick tree of wait
+    counts for the median, monotonic deques of daily extremes for max and
+    min, and est_value summed per wait for the mode.
+    """
+
+    def __init__(self, wait_dates: List[models.WaitDate], mode: str = "mean"):
+        self.wait_dates = wait_dates
+        self.total = 0.0
+        # est values are never negative, so the window's total is zero
+        # exactly when it holds no wait with a positive est value
+        self.valued = 0
+        self.days = 0
+        statistic = STATISTICS.get(mode)
+        self.statistic = statistic(wait_dates) if statistic else None
+
+    def add(self, day: int):
+        """Adds wait_dates[day], the day after the last one in the window."""
+        waits = self.wait_dates[day].waits
+        self.days += 1
+        if not waits:
+            return
+        self.total += sum(wait.est_value for wait in waits)
+        self.valued += sum(1 for wait in waits if wait.est_value > 0)
+        if self.statistic:
+            self.statistic.add(day, waits)
+
+    def remove(self, day: int):
+        """Removes wait_dates[day], the first day in the window."""
+        waits = self.wait_dates[day].waits
+        self.days -= 1
+        if not waits:
+            return
+        self.valued -= sum(1 for wait in waits if wait.est_value > 0)
+        self.total -= sum(wait.est_value for wait in waits)
+        if not self.valued:
+            # drop the rounding left over from adding and removing
+            self.total = 0.0
+        if self.statistic:
+            self.statistic.remove(day, waits)
+
+    def est_value(self) -> float:
+        """Total est value per day of the window."""
+        if not self.valued:
+            return 0
+        return self.total / self.days
+
+    def wait_days(self) -> Optional[float]:
+        if self.statistic is None:
+            return None
+        if not self.valued:
+            return 0
+        return self.statistic.value(self.total)
+
+
+class WeightedMean:
+    def __init__(self, wait_dates: List[models.WaitDate]):
+        self.weighted = 0.0
+        self.valued = 0
+
+    def add(self, day: int, waits: List[models.Wait]):
+        self.weighted += sum(wait.est_value * wait.wait_time_days for wait in waits)
+        self.valued += sum(1 for wait in waits if wait.est_value > 0)
+
+    def remove(self, day: int, waits: List[models.Wait]):
+        self.valued -= sum(1 for wait in waits if wait.est_value > 0)
+        self.weighted -= sum(wait.est_value * wait.wait_time_days for wait in waits)
+        if not self.valued:
+            self.weighted = 0.0
+
+    def value(self, total: float) -> float:
+        return self.weighted / total
+
+
+class Median:
+    """Counts of each wait in a Fenwick tree, indexed by rank among the series' distinct waits."""
+
+    def __init__(self, wait_dates: List[models.WaitDate]):
+        self.values = sorted({wait.wait_time_days for x in wait_dates for wait in x.waits})
+        self.ranks = {value: rank for rank, value in enumerate(self.values)}
+        self.tree = [0] * (len(self.values) + 1)
+        self.count = 0
+        self.top_bit = 1 << max(len(self.values).bit_length() - 1, 0)
+
+    def update(self, waits: List[models.Wait], change: int):
+        for wait_days, count in Counter(wait.wait_time_days for wait in waits).items():
+            i = self.ranks[wait_days] + 1
+            while i < len(self.tree):
+                self.tree[i] += change * count
+                i += i & -i
+        self.count += change * len(waits)
+
+    def add(self, day: int, waits: List[models.Wait]):
+        self.update(waits, 1)
+
+    def remove(self, day: int, waits: List[models.Wait]):
+        self.update(waits, -1)
+
+    def nth(self, n: int):
+        """The n-th smallest wait in the window, counting from zero."""
+        position = 0
+        bit = self.top_bit
+        while bit:
+            step = position + bit
+            if step < len(self.tree) and self.tree[step] <= n:
+                position = step
+                n -= self.tree[step]
+            bit >>= 1
+        return self.values[position]
+
+    def value(self, total: float):
+        middle = self.count // 2
+        if self.count % 2 == 1:
+            return self.nth(middle)
+        return (self.nth(middle) + self.nth(middle - 1)) / 2
+
+
+class Extreme:
+    """The longest (or shortest) wait of each day in a deque, kept in decreasing (increasing) order."""
+
+    def __init__(self, wait_dates: List[models.WaitDate], largest: bool):
+        self.sign = 1 if largest else -1
+        self.days: Deque[Tuple[int, int]] = deque()
+
+    def add(self, day: int, waits: List[models.Wait]):
+        if not waits:
+            return
+        key = max(self.sign * wait.wait_time_days for wait in waits)
+        while self.days and self.days[-1][1] <= key:
+            self.days.pop()
+        self.days.append((day, key))
+
+    def remove(self, day: int, waits: List[models.Wait]):
+        if self.days and self.days[0][0] == day:
+            self.days.popleft()
+
+    def value(self, total: float):
+        return self.sign * self.days[0][1]
+
+
+class WeightedMode:
+    """
+    est_value summed per wait. Ties go to the wait seen first in the window,
+    as they do in models.WaitDate.wait_mode.
+    """
+
+    def __init__(self, wait_dates: List[models.WaitDate]):
+        self.weights: Dict[int, float] = {}
+        self.counts: Dict[int, int] = {}
+        # days in the window holding each wait, oldest first
+        self.seen: Dict[int, Deque[int]] = {}
+        # per day in the window, each wait's est value, count and first position
+        self.day_waits: Dict[int, Dict[int, list]] = {}
+
+    def add(self, day: int, waits: List[models.Wait]):
+        day_waits: Dict[int, list] = {}
+        for position, wait in enumerate(waits):
+            entry = day_waits.get(wait.wait_time_days)
+            if entry is None:
+                day_waits[wait.wait_time_days] = [wait.est_value, 1, position]
+            else:
+                entry[0] += wait.est_value
+                entry[1] += 1
+        self.day_waits[day] = day_waits
+        for wait_days, (weight, count, _) in day_waits.items():
+            if wait_days in self.counts:
+                self.weights[wait_days] += weight
+                self.counts[wait_days] += count
+                self.seen[wait_days].append(day)
+            else:
+                self.weights[wait_days] = weight
+                self.counts[wait_days] = count
+                self.seen[wait_days] = deque([day])
+
+    def remove(self, day: int, waits: List[models.Wait]):
+        for wait_days, (weight, count, _) in self.day_waits.pop(day).items():
+            self.counts[wait_days] -= count
+            if not self.counts[wait_days]:
+                del self.weights[wait_days], self.counts[wait_days], self.seen[wait_days]
+                continue
+            self.weights[wait_days] -= weight
+            self.seen[wait_days].popleft()
+
+    def first_seen(self, wait_days: int) -> Tuple[int, int]:
+        day = self.seen[wait_days][0]
+        return day, self.day_waits[day][wait_days][2]
+
+    def value(self, total: float):
+        best = None
+        for wait_days, weight in self.weights.items():
+            if best is None or weight > best_weight * (1 + MODE_TIE_TOLERANCE):
+                best, best_weight = wait_days, weight
+            elif weight >= best_weight * (1 - MODE_TIE_TOLERANCE) and (
+                self.first_seen(wait_days) < self.first_seen(best)
+            ):
+                best, best_weight = wait_days, max(weight, best_weight)
+        return best
+
+
+STATISTICS = {
+    "mean": WeightedMean,
+    "median": Median,
+    "max": lambda wait_dates: Extreme(wait_dates, largest=True),
+    "min": lambda wait_dates: Extreme(wait_dates, largest=False),
+    "mode": WeightedMode,
+}
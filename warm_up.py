@@ -0,0 +1,106 @@
+"""
+Loads the datasets and builds the most requested series when the service starts.
+
+The order, item cost and despatch extracts run concurrently, each on its own
+pooled connection. Then the all items order history and the unfiltered wait
+series are built, so the first requests are answered from the cache. /ready
+answers 503 until this has finished, for load balancers to wait on.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+# modules
+import configs
+import e2_queries
+import predictions
+import wait_days
+
+# failed steps are retried after this long, the ones that succeeded are cache hits by then
+RETRY_SECONDS = 60
+
+# every call uses the argument shape of the request path it warms, as cache
+# keys are built from the arguments as given
+EXTRACTS: Dict[str, Callable] = {
+    "order_history": lambda: e2_queries.get_order_quantities(),
+    "item_costs": lambda: e2_queries.get_item_costs(),
+    "wait_history": lambda: e2_queries.get_raw_wait_data(),
+}
+DERIVED: Dict[str, Callable] = {
+    # GET /
+    "all_items_orders": lambda: predictions.get_orders(
+        None, site_filter=None, site_filter2=None, dollars=False
+    ),
+    # GET /wait/
+    "all_items_waits": lambda: wait_days.get_wait_days_with_missing(
+        None, None, None, "mean", None, None, None, None
+    ),
+}
+
+ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_steps: Dict[str, dict] = {}
+_steps_lock = threading.Lock()
+
+
+def status() -> Dict[str, dict]:
+    """State, seconds taken and any error of each warm-up step."""
+    with _steps_lock:
+        return {name: dict(step) for name, step in _steps.items()}
+
+
+def run_step(name: str, func: Callable) -> bool:
+    with _steps_lock:
+        _steps[name] = {"state": "running"}
+    started = time.perf_counter()
+    try:
+        func()
+        step = {"state": "done"}
+    except Exception as e:
+        logging.exception(f"Warm-up step {name} failed")
+        step = {"state": "failed", "error": str(e)}
+    step["seconds"] = round(time.perf_counter() - started, 3)
+    with _steps_lock:
+        _steps[name] = step
+    return step["state"] == "done"
+
+
+def run() -> bool:
+    """Runs every warm-up step once. Returns whether they all succeeded."""
+    with _steps_lock:
+        _steps.update({name: {"state": "pending"} for name in {**EXTRACTS, **DERIVED}})
+    for phase in [EXTRACTS, DERIVED]:
+        with ThreadPoolExecutor(max_workers=len(phase), thread_name_prefix="warm-up") as pool:
+            results = list(pool.map(lambda step: run_step(*step), phase.items()))
+        if not all(results):
+            return False
+    return True
+
+
+def run_until_ready():
+    started = time.perf_counter()
+    while not run():
+        logging.warning(f"Warm-up incomplete, retrying in {RETRY_SECONDS}s")
+        time.sleep(RETRY_SECONDS)
+    logging.info(f"Warm-up finished in {time.perf_counter() - started:.1f}s")
+    ready.set()
+
+
+def start():
+    """
+    Warms up on a background thread, or reports ready at once when WARM_UP is off.
+
+    Only the first call does anything, so it is safe to call on every request.
+    """
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    if not configs.warm_up:
+        ready.set()
+        return
+    threading.Thread(target=run_until_ready, name="warm-up", daemon=True).start()